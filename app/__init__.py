@@ -1,23 +1,55 @@
+import importlib
 import os
 import re
-from importlib.metadata import version
 
-from semantic_version import Version
+SUBMODULES = ('api', 'database', 'spotify', 'utils')
 
-from . import api, database, spotify, utils
 
-__version__ = str(Version.coerce(version(__package__)))
-match = re.match(r'.+\-(\D+)(\d+)', __version__)
-if match is not None:
-    pre_release_str = match.group(1)
-    pre_release_num = match.group(2)
-    __version__ = __version__.replace(
-        f'{pre_release_str}{pre_release_num}', f'{pre_release_str}.{pre_release_num}'
-    )
+def get_version() -> str:
+    """Gets the package version, formatted as a semantic version."""
+    from importlib.metadata import version
 
-if os.getenv('APP_LAMBDA'):
+    from semantic_version import Version
+
+    version_ = str(Version.coerce(version(__package__)))
+    match = re.match(r'.+\-(\D+)(\d+)', version_)
+    if match is not None:
+        pre_release_str = match.group(1)
+        pre_release_num = match.group(2)
+        version_ = version_.replace(
+            f'{pre_release_str}{pre_release_num}', f'{pre_release_str}.{pre_release_num}'
+        )
+    return version_
+
+
+def get_handler():
+    """
+    Creates the lambda handler of the api.
+
+    The lifespan events are disabled, otherwise Mangum runs them on every
+    invocation, opening and closing the database pool each time. The pool is
+    opened on the first request instead and reused by warm containers.
+    """
     from mangum import Mangum
 
     from .api.main import app
 
-    handler = Mangum(app)
+    return Mangum(app, lifespan='off')
+
+
+def __getattr__(name):
+    """
+    Imports submodules and creates `__version__` and `handler` on first access.
+
+    Keeps `import app` cheap, only the modules needed are imported.
+    """
+    if name in SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    if name == '__version__':
+        value = get_version()
+    elif name == 'handler' and os.getenv('APP_LAMBDA'):
+        value = get_handler()
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value
+    return value
@@ -0,0 +1,42 @@
+"""daily plays
+
+Revision ID: 2c9f6d81e4b3
+Revises: b7a3e15f9c08
+Create Date: 2026-10-18 13:40:12.052781
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2c9f6d81e4b3'
+down_revision = 'b7a3e15f9c08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dailyplays',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user', sa.Text(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('track', sa.Text(), nullable=True),
+    sa.Column('plays', sa.Integer(), nullable=False),
+    sa.Column('duration_ms', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['track'], ['tracks.id'], name='fk_dailyplays_tracks_id_track'),
+    sa.ForeignKeyConstraint(['user'], ['users.id'], name='fk_dailyplays_users_id_user'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user', 'day', 'track', name='uc_dailyplays_user_day_track')
+    )
+    # backfill from the existing played tracks
+    op.execute(
+        'INSERT INTO dailyplays ("user", day, track, plays, duration_ms) '
+        'SELECT pt."user", CAST(pt.played_at AS DATE), pt.track, count(*), '
+        'coalesce(sum(t.duration_ms), 0) '
+        'FROM playedtracks pt JOIN tracks t ON t.id = pt.track '
+        'GROUP BY pt."user", CAST(pt.played_at AS DATE), pt.track'
+    )
+
+
+def downgrade():
+    op.drop_table('dailyplays')
@@ -0,0 +1,30 @@
+"""unique track artists
+
+Revision ID: 3f7b2a9e5c14
+Revises: 9c4e1d7a2f36
+Create Date: 2026-10-18 20:41:09.527316
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3f7b2a9e5c14'
+down_revision = '9c4e1d7a2f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # remove the links saved twice by overlapping track info updates
+    op.execute(
+        'DELETE FROM trackartists a USING trackartists b '
+        'WHERE a.track = b.track AND a.artist = b.artist AND a.id > b.id'
+    )
+    op.create_unique_constraint(
+        'uc_trackartists_track_artist', 'trackartists', ['track', 'artist']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uc_trackartists_track_artist', 'trackartists', type_='unique')
@@ -0,0 +1,36 @@
+"""unique played tracks
+
+Revision ID: 5b2e9c4d1a7f
+Revises: eca6746e004b
+Create Date: 2026-10-18 10:12:31.418275
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5b2e9c4d1a7f'
+down_revision = 'eca6746e004b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # remove the duplicates left, run app/database/dedup_played_tracks.py
+    # first on large tables to avoid a long lock here
+    op.execute(
+        'DELETE FROM playedtracks a USING playedtracks b '
+        'WHERE a."user" = b."user" AND a.track = b.track '
+        'AND a.played_at = b.played_at AND a.id > b.id'
+    )
+    op.create_unique_constraint(
+        'uc_playedtracks_user_track_played_at',
+        'playedtracks',
+        ['user', 'track', 'played_at']
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        'uc_playedtracks_user_track_played_at', 'playedtracks', type_='unique'
+    )
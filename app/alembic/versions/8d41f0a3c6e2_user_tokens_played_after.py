@@ -0,0 +1,25 @@
+"""user tokens played after
+
+Revision ID: 8d41f0a3c6e2
+Revises: 5b2e9c4d1a7f
+Create Date: 2026-10-18 11:03:54.901237
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0a3c6e2'
+down_revision = '5b2e9c4d1a7f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('usertokens', sa.Column('played_after', sa.BigInteger(), nullable=True))
+    op.add_column('usertokens', sa.Column('last_poll_plays', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('usertokens', 'last_poll_plays')
+    op.drop_column('usertokens', 'played_after')
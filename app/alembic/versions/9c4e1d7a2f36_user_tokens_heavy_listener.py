@@ -0,0 +1,36 @@
+"""user tokens heavy listener
+
+Revision ID: 9c4e1d7a2f36
+Revises: f3a8c27d5b10
+Create Date: 2026-10-18 20:04:51.218930
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9c4e1d7a2f36'
+down_revision = 'f3a8c27d5b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('usertokens', sa.Column('polled_at', sa.BigInteger(), nullable=True))
+    op.add_column(
+        'usertokens',
+        sa.Column(
+            'heavy_listener', sa.Boolean(), nullable=False, server_default=sa.false()
+        )
+    )
+    op.add_column(
+        'usertokens',
+        sa.Column('low_rate_polls', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.execute('UPDATE usertokens SET heavy_listener = true WHERE last_poll_plays >= 40')
+
+
+def downgrade():
+    op.drop_column('usertokens', 'low_rate_polls')
+    op.drop_column('usertokens', 'heavy_listener')
+    op.drop_column('usertokens', 'polled_at')
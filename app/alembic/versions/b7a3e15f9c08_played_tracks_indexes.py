@@ -0,0 +1,36 @@
+"""played tracks indexes
+
+Revision ID: b7a3e15f9c08
+Revises: 8d41f0a3c6e2
+Create Date: 2026-10-18 12:21:07.338914
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b7a3e15f9c08'
+down_revision = '8d41f0a3c6e2'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_playedtracks_user_played_at', 'playedtracks', ['user', 'played_at', 'id']),
+    ('ix_trackartists_track', 'trackartists', ['track']),
+    ('ix_trackartists_artist', 'trackartists', ['artist']),
+    ('ix_genres_artist', 'genres', ['artist']),
+]
+
+
+def upgrade():
+    # indexes are built concurrently so the tables are not locked,
+    # which can't happen inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""cache generations
+
+Revision ID: e0d57a2b6f19
+Revises: 2c9f6d81e4b3
+Create Date: 2026-10-18 14:52:46.710293
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e0d57a2b6f19'
+down_revision = '2c9f6d81e4b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cachegenerations',
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cachegenerations')
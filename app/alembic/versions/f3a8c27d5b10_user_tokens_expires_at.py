@@ -0,0 +1,23 @@
+"""user tokens expires at
+
+Revision ID: f3a8c27d5b10
+Revises: e0d57a2b6f19
+Create Date: 2026-10-18 15:42:18.377504
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c27d5b10'
+down_revision = 'e0d57a2b6f19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('usertokens', sa.Column('expires_at', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('usertokens', 'expires_at')
@@ -1,5 +1,6 @@
 from typing import Dict, List, Text, Union
 
+from app.api.crud.user import invalidate_user
 from app.database.schema import User, UserToken
 
 
@@ -11,6 +12,7 @@ async def get_all_users():
 async def update_user(user: User):
     """Updates user on db."""
     user = await user.update()
+    invalidate_user(user.id)
     await UserToken.objects.create(user=user)
 
 
@@ -25,6 +27,7 @@ async def add_scopes(query: Dict, scopes: Union[List[Text], Text]):
         _ = [user_scopes.add(scope) for scope in scopes]
         user.scopes = ' '.join(user_scopes)
         user = await user.update()
+        invalidate_user(user.id)
     return user
 
 
@@ -39,4 +42,5 @@ async def remove_scopes(query: Dict, scopes: Union[List[Text], Text]):
         _ = [user_scopes.remove(scope) for scope in scopes]
         user.scopes = ' '.join(user_scopes)
         user = await user.update()
+        invalidate_user(user.id)
     return user
@@ -1,54 +1,397 @@
-from collections import Counter, defaultdict
-from typing import DefaultDict, Dict, List, Optional
+import operator
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, DefaultDict, Dict, List, Mapping, Optional, Text, Tuple
 
-from app.database.schema import PlayedTrack, Track, TrackArtist
-from app.utils.data import filter_duplicate_dicts_by_key
+import sqlalchemy
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
 
+from app.database.schema import (
+    Artist,
+    DailyPlay,
+    Genre,
+    PlayedTrack,
+    Track,
+    TrackArtist,
+    db,
+)
 
-async def get_played_tracks(query: Dict) -> List[Dict]:
-    """Gets user from database."""
-    played_tracks = await PlayedTrack.objects.select_related(
-        ['track']
-    ).all(**query)
-    return [pt.dict() for pt in played_tracks]
+TRACK_COLUMNS = ['id', 'name', 'href', 'uri', 'popularity']
+PERCENTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+OPERATORS = {
+    '': operator.eq,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in': lambda column, value: column.in_(value),
+}
 
 
-async def get_tracks(query: Optional[Dict] = None) -> List[Dict]:
-    """Gets user listened tracks."""
+def filter_clauses(table: sqlalchemy.Table, query: Dict) -> List:
+    """
+    Translates a query into sqlalchemy where clauses.
+
+    Parameters
+    ----------
+    table : sqlalchemy.Table
+        table to filter
+    query : dict
+        filters as `column` or `column__operator` and value,
+        operators are gt, gte, lt, lte and in
+
+    Returns
+    -------
+    list
+        where clauses
+    """
+    clauses = []
+    for key, value in query.items():
+        column, _, op = key.partition('__')
+        clauses.append(OPERATORS[op](table.c[column], value))
+    return clauses
+
+
+def track_counts(query: Dict) -> sqlalchemy.sql.Alias:
+    """
+    Builds a subquery with the number of plays of each track.
+
+    Plays are summed from the `daily_plays` rollup.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the daily plays
+
+    Returns
+    -------
+    sqlalchemy.sql.Alias
+        subquery with `track` and `count` columns
+    """
+    daily_plays = DailyPlay.Meta.table
+    return sqlalchemy.select([
+        daily_plays.c.track,
+        sum_counts(daily_plays.c.plays).label('count')
+    ]).where(
+        sqlalchemy.and_(*filter_clauses(daily_plays, query))
+    ).group_by(daily_plays.c.track).alias('track_counts')
+
+
+def sum_counts(column: sqlalchemy.Column) -> sqlalchemy.sql.ColumnElement:
+    """Sums the column, as an integer."""
+    return sqlalchemy.cast(func.sum(column), sqlalchemy.BigInteger)
+
+
+def artist_counts(query: Dict) -> sqlalchemy.sql.Alias:
+    """
+    Builds a subquery with the number of plays of each artist.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the daily plays
+
+    Returns
+    -------
+    sqlalchemy.sql.Alias
+        subquery with `artist` and `count` columns
+    """
+    counts = track_counts(query)
+    track_artists = TrackArtist.Meta.table
+    return sqlalchemy.select(
+        [
+            track_artists.c.artist,
+            sum_counts(counts.c.count).label('count')
+        ]
+    ).select_from(
+        counts.join(track_artists, track_artists.c.track == counts.c.track)
+    ).group_by(track_artists.c.artist).alias('artist_counts')
+
+
+def encode_cursor(played_track: Dict) -> Text:
+    """
+    Encodes the position of a played track as a pagination cursor.
+
+    Parameters
+    ----------
+    played_track : dict
+        played track with `played_at` and `id`
+
+    Returns
+    -------
+    str
+        cursor
+    """
+    return f"{played_track['played_at'].isoformat()}_{played_track['id']}"
+
+
+def decode_cursor(cursor: Text) -> Tuple[datetime, int]:
+    """
+    Decodes a pagination cursor.
+
+    Parameters
+    ----------
+    cursor : str
+        cursor created by `encode_cursor`
+
+    Returns
+    -------
+    tuple of datetime and int
+        played at and id of the last played track of the previous page
+
+    Raises
+    ------
+    ValueError
+        if the cursor is not valid or its played at has a timezone
+    """
+    played_at, _, id_ = cursor.rpartition('_')
+    played_at = datetime.fromisoformat(played_at)
+    if played_at.tzinfo is not None:
+        raise ValueError(f'cursor played at must be naive utc, got {played_at}')
+    return played_at, int(id_)
+
+
+def played_tracks_query(
+    query: Dict, limit: Optional[int] = None, cursor: Optional[Text] = None
+) -> sqlalchemy.sql.Select:
+    """
+    Builds the query of played tracks ordered by `played_at` and `id`.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the played tracks
+    limit : int, optional
+        maximum number of played tracks, by default all
+    cursor : str, optional
+        cursor of the last played track of the previous page, by default None
+
+    Returns
+    -------
+    sqlalchemy.sql.Select
+        played tracks query
+    """
+    played_tracks = PlayedTrack.Meta.table
+    tracks = Track.Meta.table
+    clauses = filter_clauses(played_tracks, query)
+    if cursor is not None:
+        clauses.append(
+            sqlalchemy.tuple_(played_tracks.c.played_at, played_tracks.c.id)
+            > sqlalchemy.tuple_(*decode_cursor(cursor))
+        )
+    return sqlalchemy.select([
+        played_tracks.c.id,
+        played_tracks.c.played_at,
+        *(tracks.c[column].label(f'track_{column}') for column in TRACK_COLUMNS),
+    ]).select_from(
+        played_tracks.join(tracks, tracks.c.id == played_tracks.c.track)
+    ).where(
+        sqlalchemy.and_(*clauses)
+    ).order_by(
+        played_tracks.c.played_at, played_tracks.c.id
+    ).limit(limit)
+
+
+def played_track_from_row(row: Mapping) -> Dict:
+    """Nests the track columns of a played tracks query row."""
+    return {
+        'id': row['id'],
+        'played_at': row['played_at'],
+        'track': {column: row[f'track_{column}'] for column in TRACK_COLUMNS},
+    }
+
+
+async def get_played_tracks(
+    query: Dict, limit: Optional[int] = None, cursor: Optional[Text] = None
+) -> List[Dict]:
+    """
+    Gets user played tracks, ordered by `played_at`.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the played tracks
+    limit : int, optional
+        maximum number of played tracks, by default all
+    cursor : str, optional
+        cursor of the last played track of the previous page, by default None
+
+    Returns
+    -------
+    list of dict
+        played tracks
+    """
+    rows = await db.fetch_all(played_tracks_query(query, limit, cursor))
+    return [played_track_from_row(row) for row in rows]
+
+
+async def iterate_played_tracks(
+    query: Dict, cursor: Optional[Text] = None
+) -> AsyncIterator[Dict]:
+    """
+    Yields user played tracks from a database cursor, ordered by `played_at`.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the played tracks
+    cursor : str, optional
+        cursor of the last played track of the previous page, by default None
+
+    Yields
+    ------
+    dict
+        played track
+    """
+    async for row in db.iterate(played_tracks_query(query, cursor=cursor)):
+        yield played_track_from_row(row)
+
+
+def tracks_query(
+    query: Dict, limit: Optional[int] = None, offset: Optional[int] = 0
+) -> sqlalchemy.sql.Select:
+    """
+    Builds the query of tracks with their artists names and play count.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the daily plays
+    limit : int, optional
+        maximum number of tracks, by default all
+    offset : int, optional
+        number of tracks to skip, by default 0
+
+    Returns
+    -------
+    sqlalchemy.sql.Select
+        tracks query, ordered by the number of plays
+    """
+    counts = track_counts(query)
+    tracks = Track.Meta.table
+    track_artists = TrackArtist.Meta.table
+    artists = Artist.Meta.table
+    return sqlalchemy.select([
+        tracks.c.id,
+        tracks.c.name,
+        tracks.c.href,
+        tracks.c.uri,
+        tracks.c.popularity,
+        counts.c.count,
+        func.array_remove(func.array_agg(artists.c.name), None).label('trackartists'),
+    ]).select_from(
+        counts.join(tracks, tracks.c.id == counts.c.track)
+        .outerjoin(track_artists, track_artists.c.track == tracks.c.id)
+        .outerjoin(artists, artists.c.id == track_artists.c.artist)
+    ).group_by(
+        tracks.c.id, counts.c.count
+    ).order_by(
+        counts.c.count.desc(), tracks.c.id
+    ).limit(limit).offset(offset)
+
+
+async def get_tracks(
+    query: Optional[Dict] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0
+) -> List[Dict]:
+    """
+    Gets user listened tracks, with their play count.
+
+    Tracks are counted and joined to their artists on the database,
+    ordered by the number of plays.
+
+    Parameters
+    ----------
+    query : dict, optional
+        filters on the daily plays, by default {}
+    limit : int, optional
+        maximum number of tracks, by default all
+    offset : int, optional
+        number of tracks to skip, by default 0
+
+    Returns
+    -------
+    list of dict
+        tracks with artists names and play count
+    """
     if query is None:
         query = dict()
-    played_tracks = await PlayedTrack.objects.all(**query)
-    tracks = await Track.objects.select_related(
-        ['trackartists']
-    ).all(id__in=[r.track.id for r in played_tracks])
-    for t in tracks:
-        for ta in t.trackartists:
-            await ta.artist.load()
-    count_tracks = Counter([pt.track.id for pt in played_tracks])
-
-    tracks = [t.dict() for t in tracks]
-    tracks = filter_duplicate_dicts_by_key(tracks, 'id')
-    return [{**t, 'count': count_tracks[t['id']]} for t in tracks]
-
-
-async def get_artists(query: Optional[Dict] = None) -> List[Dict]:
-    """Gets user listened artists."""
+    rows = await db.fetch_all(tracks_query(query, limit, offset))
+    return [dict(row) for row in rows]
+
+
+def artists_query(
+    query: Dict, limit: Optional[int] = None, offset: Optional[int] = 0
+) -> sqlalchemy.sql.Select:
+    """
+    Builds the query of artists with their genres and play count.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the daily plays
+    limit : int, optional
+        maximum number of artists, by default all
+    offset : int, optional
+        number of artists to skip, by default 0
+
+    Returns
+    -------
+    sqlalchemy.sql.Select
+        artists query, ordered by the number of plays
+    """
+    counts = artist_counts(query)
+    artists = Artist.Meta.table
+    genres = Genre.Meta.table
+    return sqlalchemy.select([
+        artists.c.id,
+        artists.c.name,
+        artists.c.href,
+        artists.c.uri,
+        artists.c.popularity,
+        counts.c.count,
+        func.array_remove(func.array_agg(genres.c.genre), None).label('genres'),
+    ]).select_from(
+        counts.join(artists, artists.c.id == counts.c.artist)
+        .outerjoin(genres, genres.c.artist == artists.c.id)
+    ).group_by(
+        artists.c.id, counts.c.count
+    ).order_by(
+        counts.c.count.desc(), artists.c.id
+    ).limit(limit).offset(offset)
+
+
+async def get_artists(
+    query: Optional[Dict] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0
+) -> List[Dict]:
+    """
+    Gets user listened artists, with their play count.
+
+    Artists are counted and joined to their genres on the database,
+    ordered by the number of plays.
+
+    Parameters
+    ----------
+    query : dict, optional
+        filters on the daily plays, by default {}
+    limit : int, optional
+        maximum number of artists, by default all
+    offset : int, optional
+        number of artists to skip, by default 0
+
+    Returns
+    -------
+    list of dict
+        artists with genres and play count
+    """
     if query is None:
         query = dict()
-    played_tracks = await PlayedTrack.objects.select_related(
-        ['track__trackartists']
-    ).all(**query)
-    track_artists = await TrackArtist.objects.select_related(
-        ['artist__genres']
-    ).all(track__id__in=[pt.track.id for pt in played_tracks])
-    artists = [ta.artist for ta in track_artists]
-    count_artists = Counter(
-        [ta.artist.id for pt in played_tracks for ta in pt.track.trackartists]
-    )
-
-    artists = [a.dict() for a in artists]
-    artists = filter_duplicate_dicts_by_key(artists, 'id')
-    return [{**a, 'count': count_artists[a['id']]} for a in artists]
+    rows = await db.fetch_all(artists_query(query, limit, offset))
+    return [dict(row) for row in rows]
 
 
 async def get_audio_features(
@@ -67,18 +410,165 @@ async def get_audio_features(
     return audio_features
 
 
-async def get_genres(query: Optional[Dict] = None) -> List[Dict]:
-    """Gets user listened genres."""
+async def get_audio_features_summary(
+    query: Optional[Dict] = None,
+    features: Optional[List[str]] = None,
+    bins: Optional[int] = 10
+) -> Dict[str, Dict]:
+    """
+    Gets user listened audio features summary statistics and histograms.
+
+    Statistics and histograms are computed on the database, every play
+    of a track counts as one value. The histograms of all features are
+    counted by a single query.
+
+    Parameters
+    ----------
+    query : dict, optional
+        filters on the played tracks, by default {}
+    features : list of str, optional
+        features to summarize, by default []
+    bins : int, optional
+        number of equal width histogram bins, by default 10
+
+    Returns
+    -------
+    dict
+        for each feature, the number of values, mean, std, min, max,
+        `PERCENTILES`, histogram bins edges and counts
+    """
     if query is None:
         query = dict()
-    played_tracks = await PlayedTrack.objects.select_related(
-        ['track__trackartists']
-    ).all(**query)
-    track_artists = await TrackArtist.objects.select_related(
-        ['artist__genres']
-    ).all(track__id__in=[pt.track.id for pt in played_tracks])
-    artists = [ta.artist for ta in track_artists]
-    count_genres = Counter(
-        [g.genre for artist in artists for g in artist.genres]
+    if features is None:
+        features = list()
+    played_tracks = PlayedTrack.Meta.table
+    tracks = Track.Meta.table
+    source = played_tracks.join(tracks, tracks.c.id == played_tracks.c.track)
+    where = sqlalchemy.and_(*filter_clauses(played_tracks, query))
+
+    percentiles_type = postgresql.ARRAY(sqlalchemy.Float)
+    columns = []
+    for feature in features:
+        column = sqlalchemy.cast(tracks.c[feature], sqlalchemy.Float)
+        columns += [
+            func.count(column).label(f'{feature}_count'),
+            func.avg(column).label(f'{feature}_mean'),
+            func.stddev_pop(column).label(f'{feature}_std'),
+            func.min(column).label(f'{feature}_min'),
+            func.max(column).label(f'{feature}_max'),
+            sqlalchemy.type_coerce(
+                func.percentile_cont(
+                    sqlalchemy.cast(postgresql.array(PERCENTILES), percentiles_type)
+                ).within_group(column),
+                percentiles_type,
+            ).label(f'{feature}_percentiles'),
+        ]
+    if not columns:
+        return {}
+    stats = await db.fetch_one(
+        sqlalchemy.select(columns).select_from(source).where(where)
     )
-    return count_genres
+
+    summary = {}
+    buckets = {}
+    for feature in features:
+        column = sqlalchemy.cast(tracks.c[feature], sqlalchemy.Float)
+        count = stats[f'{feature}_count']
+        low, high = stats[f'{feature}_min'], stats[f'{feature}_max']
+        percentiles = stats[f'{feature}_percentiles'] or [None] * len(PERCENTILES)
+        summary[feature] = {
+            'count': count,
+            'mean': stats[f'{feature}_mean'],
+            'std': stats[f'{feature}_std'],
+            'min': low,
+            'max': high,
+            'percentiles': dict(zip(PERCENTILES, percentiles)),
+            'bins': [],
+            'counts': [],
+        }
+        if not count:
+            continue
+        if low == high:
+            summary[feature].update(bins=[low, high], counts=[count])
+            continue
+        width = (high - low) / bins
+        summary[feature].update(
+            bins=[low + i * width for i in range(bins + 1)], counts=[0] * bins
+        )
+        buckets[feature] = sqlalchemy.case(
+            (column >= high, bins), else_=func.width_bucket(column, low, high, bins)
+        ).label(f'{feature}_bucket')
+    if not buckets:
+        return summary
+
+    # one grouping set per feature, its rows have null buckets for the other
+    # features, and a null bucket of its own for the tracks without the feature
+    histograms = await db.fetch_all(
+        sqlalchemy.select([*buckets.values(), func.count().label('count')])
+        .select_from(source)
+        .where(where)
+        .group_by(func.grouping_sets(*(
+            sqlalchemy.tuple_(sqlalchemy.literal_column(bucket.name))
+            for bucket in buckets.values()
+        )))
+    )
+    for row in histograms:
+        for feature, bucket in buckets.items():
+            if row[bucket.name] is not None:
+                summary[feature]['counts'][row[bucket.name] - 1] = row['count']
+                break
+    return summary
+
+
+def genres_query(query: Dict, limit: Optional[int] = None) -> sqlalchemy.sql.Select:
+    """
+    Builds the query of genres with their play count.
+
+    Parameters
+    ----------
+    query : dict
+        filters on the daily plays
+    limit : int, optional
+        maximum number of genres, by default all
+
+    Returns
+    -------
+    sqlalchemy.sql.Select
+        genres query, ordered by the number of plays
+    """
+    counts = artist_counts(query)
+    genres = Genre.Meta.table
+    count = sum_counts(counts.c.count).label('count')
+    return sqlalchemy.select([
+        genres.c.genre, count
+    ]).select_from(
+        counts.join(genres, genres.c.artist == counts.c.artist)
+    ).group_by(
+        genres.c.genre
+    ).order_by(
+        count.desc(), genres.c.genre
+    ).limit(limit)
+
+
+async def get_genres(
+    query: Optional[Dict] = None, limit: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Gets user listened genres, with their play count.
+
+    Parameters
+    ----------
+    query : dict, optional
+        filters on the daily plays, by default {}
+    limit : int, optional
+        maximum number of genres, by default all
+
+    Returns
+    -------
+    dict
+        genres and play count, ordered by play count
+    """
+    if query is None:
+        query = dict()
+    rows = await db.fetch_all(genres_query(query, limit))
+    return {row['genre']: row['count'] for row in rows}
@@ -1,8 +1,16 @@
-from typing import Dict, Optional
+import os
+from typing import Dict, Optional, Text
 
 from asyncpg.exceptions import UniqueViolationError
 
+from app.api.models import UserModel
 from app.database.schema import User, UserToken
+from app.utils.cache import TTLCache
+
+USER_CACHE_MAXSIZE = int(os.getenv('APP_USER_CACHE_MAXSIZE', 1024))
+USER_CACHE_TTL = float(os.getenv('APP_USER_CACHE_TTL', 60))
+
+_users = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
 
 
 async def get_user(query: Dict) -> Optional[User]:
@@ -11,6 +19,38 @@ async def get_user(query: Dict) -> Optional[User]:
     return user
 
 
+async def get_cached_user(user_id: Text) -> Optional[UserModel]:
+    """
+    Gets user by id, from the cache if it was read in the last USER_CACHE_TTL.
+
+    The cache is per process, so changes made by another process are seen
+    after at most USER_CACHE_TTL seconds.
+
+    Parameters
+    ----------
+    user_id : str
+        user unique identifier
+
+    Returns
+    -------
+    UserModel, optional
+        user if it exists
+    """
+    user = _users.get(user_id)
+    if user is None:
+        user = await get_user({'id': user_id})
+        if user is None:
+            return None
+        user = UserModel(**user.dict())
+        _users.set(user_id, user)
+    return user.copy()
+
+
+def invalidate_user(user_id: Text):
+    """Removes user from the cache, must be called when the user changes."""
+    _users.delete(user_id)
+
+
 async def create_user(user) -> Optional[User]:
     """Create new user on database."""
     try:
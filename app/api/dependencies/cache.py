@@ -0,0 +1,72 @@
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, Optional, Text
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from app.database.generations import get_generation
+from app.utils.cache import TTLCache, get_cache
+
+CACHE_URL = os.getenv('APP_CACHE_URL')
+CACHE_MAXSIZE = int(os.getenv('APP_CACHE_MAXSIZE', 1024))
+CACHE_TTL = float(os.getenv('APP_CACHE_TTL', 3600))
+GENERATION_TTL = float(os.getenv('APP_CACHE_GENERATION_TTL', 10))
+
+cache = get_cache(CACHE_URL, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+_generation = TTLCache(maxsize=1, ttl=GENERATION_TTL)
+
+
+async def current_generation() -> int:
+    """Gets the cache generation, read from the database every GENERATION_TTL."""
+    generation = _generation.get('generation')
+    if generation is None:
+        generation = await get_generation()
+        _generation.set('generation', generation)
+    return generation
+
+
+async def cached_response(
+    request: Request,
+    response_model: Any,
+    compute: Callable[[], Awaitable[Any]],
+    user_id: Optional[Text] = None,
+) -> Response:
+    """
+    Gets the endpoint response from the cache, or computes and caches it.
+
+    Responses are keyed by the cache generation, path, query parameters and
+    `user_id`, and are invalidated when the ETL increases the generation.
+    The key is sent as the `ETag`, so requests with a matching
+    `If-None-Match` are answered with 304 without reading the cache.
+
+    Parameters
+    ----------
+    request : Request
+        endpoint request
+    response_model : type
+        endpoint response model, used to validate the computed response
+    compute : callable
+        coroutine function computing the response
+    user_id : str, optional
+        user the response belongs to, by default None
+
+    Returns
+    -------
+    Response
+        json response, or not modified response
+    """
+    generation = await current_generation()
+    params = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.multi_items()))
+    key = f'{generation}:{request.url.path}:{user_id}:{params}'
+    etag = f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    content = await cache.get(key)
+    if content is None:
+        content = jsonable_encoder(parse_obj_as(response_model, await compute()))
+        await cache.set(key, content)
+    return JSONResponse(content=content, headers=headers)
@@ -17,6 +17,8 @@ class Settings(BaseSettings):
     secret_key: Optional[str] = ''
     algorithm: Optional[str] = ''
     access_token_expire_minutes: Optional[int] = 0
+    bcrypt_rounds: Optional[int] = 12
+    password_hash_workers: Optional[int] = 4
 
 
 SETTINGS = Settings()
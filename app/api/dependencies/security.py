@@ -1,14 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Mapping, Optional, Text
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Text, Tuple
 
 from fastapi import Depends, status
 from fastapi.exceptions import HTTPException
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import ValidationError
 
-from app.api.crud.user import get_user
+from app.api.crud.user import get_cached_user, get_user, invalidate_user
 from app.api.dependencies.config import SETTINGS
 from app.api.models import TokenData, UserModel
 from app.database.schema import User
@@ -22,7 +24,6 @@ oauth2_scheme = OAuth2PasswordBearer(
         'admin': 'Admin privileges'
     },
 )
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
 
 async def authorize_spotify() -> Dict:
@@ -120,7 +121,16 @@ async def authenticate_user(
         scopes = []
     authenticate_value = 'Bearer'
     user = await get_user({'email': email})
-    if user and verify_password(password, user.hashed_password):
+    verified = False
+    if user:
+        verified, new_hash = await verify_and_update_password(
+            password, user.hashed_password
+        )
+    if verified:
+        if new_hash:
+            user.hashed_password = new_hash
+            await user.update(_columns=['hashed_password'])
+            invalidate_user(user.id)
         user_scopes = user.scopes.split()
         for scope in scopes:
             if scope not in user_scopes:
@@ -138,7 +148,39 @@ async def authenticate_user(
     )
 
 
-def verify_password(plain_password: Text, hashed_password: Text) -> bool:
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Creates the password hashing context on first use."""
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=['bcrypt'],
+        deprecated='auto',
+        bcrypt__default_rounds=SETTINGS.bcrypt_rounds,
+        bcrypt__min_rounds=SETTINGS.bcrypt_rounds,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_pwd_executor() -> ThreadPoolExecutor:
+    """Creates the thread pool used for password hashing on first use."""
+    return ThreadPoolExecutor(
+        max_workers=SETTINGS.password_hash_workers, thread_name_prefix='bcrypt'
+    )
+
+
+async def run_in_pwd_executor(func, *args):
+    """
+    Runs the blocking password hashing function on the password thread pool.
+
+    bcrypt releases the GIL, so hashing on threads keeps the event loop free
+    and `SETTINGS.password_hash_workers` bounds how many hashes run at once.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pwd_executor(), func, *args)
+
+
+async def verify_password(plain_password: Text, hashed_password: Text) -> bool:
     """
     Verifies if password and password hash matches.
 
@@ -154,10 +196,38 @@ def verify_password(plain_password: Text, hashed_password: Text) -> bool:
     bool
         if passwords match
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await run_in_pwd_executor(
+        get_pwd_context().verify, plain_password, hashed_password
+    )
+
+
+async def verify_and_update_password(
+    plain_password: Text, hashed_password: Text
+) -> Tuple[bool, Optional[Text]]:
+    """
+    Verifies if password and password hash matches, and rehashes outdated hashes.
+
+    A hash needs to be updated when its scheme is deprecated or it was made
+    with less than `SETTINGS.bcrypt_rounds`.
+
+    Parameters
+    ----------
+    plain_password : str
+        password
+    hashed_password : str
+        password hash
+
+    Returns
+    -------
+    tuple of bool and str
+        if passwords match, and the new password hash if it must be replaced
+    """
+    return await run_in_pwd_executor(
+        get_pwd_context().verify_and_update, plain_password, hashed_password
+    )
 
 
-def get_password_hash(password: Text) -> Text:
+async def get_password_hash(password: Text) -> Text:
     """
     Creates hash from password.
 
@@ -171,7 +241,7 @@ def get_password_hash(password: Text) -> Text:
     str
         password hash
     """
-    return pwd_context.hash(password)
+    return await run_in_pwd_executor(get_pwd_context().hash, password)
 
 
 async def get_current_user(
@@ -217,7 +287,7 @@ async def get_current_user(
         token_data = TokenData(id=userid, scopes=token_scopes)
     except (JWTError, ValidationError):
         raise credentials_exception
-    user = await get_user({'id': token_data.id})
+    user = await get_cached_user(token_data.id)
     if user is None:
         raise credentials_exception
     for scope in security_scopes.scopes:
@@ -227,5 +297,4 @@ async def get_current_user(
                 detail='Not enough permissions',
                 headers={'WWW-Authenticate': authenticate_value},
             )
-    user = UserModel(**user.dict())
     return user
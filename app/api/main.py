@@ -1,10 +1,10 @@
+from functools import lru_cache
 from pathlib import Path
 
 from fastapi import Depends, FastAPI, Form, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse
 
 from app import __version__
@@ -21,6 +21,7 @@ from app.api.models import Token
 from app.api.routers import admin, items, user
 from app.database.schema import db
 from app.spotify.api import get_refresh_token, get_user_me
+from app.utils.misc import close_clients
 
 app_version = __version__
 root_path = f'/{SETTINGS.app_env}'
@@ -41,7 +42,14 @@ app.add_middleware(
     allow_headers=['x-apigateway-header', 'Content-Type', 'X-Amz-Date'],
 )
 app.state.database = db
-templates = Jinja2Templates(directory=Path(__file__).resolve().parent / 'templates')
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """Creates the html templates on first use, jinja is only needed on /callback."""
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory=Path(__file__).resolve().parent / 'templates')
 
 
 @app.on_event('startup')
@@ -52,12 +60,22 @@ async def startup():
         await database_.connect()
 
 
+@app.middleware('http')
+async def connect_database(request: Request, call_next):
+    """Connects to the database on the first request when startup did not run."""
+    database_ = app.state.database
+    if not database_.is_connected:
+        await database_.connect()
+    return await call_next(request)
+
+
 @app.on_event('shutdown')
 async def shutdown():
     """Executes on application shutdown."""
     database_ = app.state.database
     if database_.is_connected:
         await database_.disconnect()
+    await close_clients()
 
 
 @app.get('/')
@@ -87,7 +105,7 @@ async def callback(code: str, request: Request = None):
     user = await get_user_me(access_token)
     user['refresh_token'] = refresh_token
 
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
         'register.html',
         context={**user, 'request': request, 'action': f'{root_path}/register'}
     )
@@ -113,7 +131,7 @@ async def register(
         'uri': uri,
         'href': href,
         'refresh_token': refresh_token,
-        'hashed_password': get_password_hash(password),
+        'hashed_password': await get_password_hash(password),
         'scopes': 'user'
     }
     user = await create_user(user)
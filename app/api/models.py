@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional, Text
+from typing import Dict, List, Optional, Text
 
 from pydantic import BaseModel
 from pydantic.class_validators import validator
@@ -125,6 +125,8 @@ class TrackModel(BaseModel):
     @validator('trackartists', pre=True, each_item=True)
     def extract_artists_names(cls, value):  # noqa:N805
         """Extracts names of the artists from Artist."""
+        if isinstance(value, str):
+            return value
         return value.get('artist').get('name')
 
 
@@ -159,6 +161,8 @@ class ArtistModel(BaseModel):
     @validator('genres', pre=True, each_item=True)
     def extract_genres_names(cls, value):  # noqa:N805
         """Extracts names of the genre from Genre."""
+        if isinstance(value, str):
+            return value
         return value.get('genre')
 
 
@@ -219,3 +223,37 @@ class PlayedTrackModel(BaseModel):
     id: int
     track: TrackModel
     played_at: datetime
+
+
+class AudioFeatureSummaryModel(BaseModel):
+    """
+    AudioFeatureSummary model.
+
+    Attributes
+    ----------
+        count: int
+            number of values
+        mean: float, optional
+            values mean
+        std: float, optional
+            values population standard deviation
+        min: float, optional
+            minimum value
+        max: float, optional
+            maximum value
+        percentiles: dict of float to float
+            value at each percentile
+        bins: list of float
+            histogram bins edges
+        counts: list of int
+            number of values in each histogram bin
+    """
+
+    count: int
+    mean: Optional[float]
+    std: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+    percentiles: Dict[float, Optional[float]]
+    bins: List[float]
+    counts: List[int]
@@ -1,16 +1,18 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
-from fastapi import APIRouter, Query, Security
+from fastapi import APIRouter, Query, Request, Security
 
 from app.api.crud.played_tracks import (
     get_artists,
     get_audio_features,
+    get_audio_features_summary,
     get_genres,
     get_tracks,
 )
+from app.api.dependencies.cache import cached_response
 from app.api.dependencies.config import AUDIO_FEATURES
 from app.api.dependencies.security import get_current_user
-from app.api.models import ArtistModel, TrackModel, UserModel
+from app.api.models import ArtistModel, AudioFeatureSummaryModel, TrackModel, UserModel
 
 router = APIRouter(
     prefix='/items',
@@ -20,18 +22,28 @@ router = APIRouter(
 
 @router.get('/tracks', response_model=List[TrackModel])
 async def tracks(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),  # noqa: B008
+    offset: int = Query(0, ge=0),  # noqa: B008
     current_user: UserModel = Security(get_current_user, scopes=['items'])  # noqa:B008
 ):
-    """User played tracks."""
-    return await get_tracks()
+    """User played tracks, ordered by play count."""
+    return await cached_response(
+        request, List[TrackModel], lambda: get_tracks(limit=limit, offset=offset)
+    )
 
 
 @router.get('/artists', response_model=List[ArtistModel])
 async def artists(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),  # noqa: B008
+    offset: int = Query(0, ge=0),  # noqa: B008
     current_user: UserModel = Security(get_current_user, scopes=['items'])  # noqa:B008
 ):
-    """User played artists."""
-    return await get_artists()
+    """User played artists, ordered by play count."""
+    return await cached_response(
+        request, List[ArtistModel], lambda: get_artists(limit=limit, offset=offset)
+    )
 
 
 @router.get('/audio-features', response_model=Dict[str, List[Union[float, int]]])
@@ -47,9 +59,34 @@ async def audio_features(
     return await get_audio_features(features=features)
 
 
+@router.get(
+    '/audio-features/summary', response_model=Dict[str, AudioFeatureSummaryModel]
+)
+async def audio_features_summary(
+    request: Request,
+    features: List[str] = Query(  # noqa: B008
+        AUDIO_FEATURES,
+        description='List of features to get. Accepted values in default'
+    ),
+    bins: int = Query(10, ge=1, le=100),  # noqa: B008
+    current_user: UserModel = Security(get_current_user, scopes=['items'])  # noqa:B008
+):
+    """User played tracks audio features statistics and histograms."""
+    features = [*(set(AUDIO_FEATURES) & set(features))]
+    return await cached_response(
+        request,
+        Dict[str, AudioFeatureSummaryModel],
+        lambda: get_audio_features_summary(features=features, bins=bins)
+    )
+
+
 @router.get('/genres', response_model=Dict[str, int])
 async def genres(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),  # noqa: B008
     current_user: UserModel = Security(get_current_user, scopes=['items'])  # noqa:B008
 ):
-    """User played tracks artists genres."""
-    return await get_genres()
+    """User played tracks artists genres, ordered by play count."""
+    return await cached_response(
+        request, Dict[str, int], lambda: get_genres(limit=limit)
+    )
@@ -1,18 +1,32 @@
-from datetime import date
+from datetime import date, datetime, time, tzinfo
 from typing import Dict, List, Optional, Union
 
-from fastapi import APIRouter, Query, Security
+from dateutil.tz import UTC, gettz
+from dateutil.zoneinfo import get_zonefile_instance
+from fastapi import APIRouter, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
 
 from app.api.crud.played_tracks import (
+    decode_cursor,
+    encode_cursor,
     get_artists,
     get_audio_features,
+    get_audio_features_summary,
     get_genres,
     get_played_tracks,
     get_tracks,
+    iterate_played_tracks,
 )
+from app.api.dependencies.cache import cached_response
 from app.api.dependencies.config import AUDIO_FEATURES
 from app.api.dependencies.security import get_current_user
-from app.api.models import ArtistModel, PlayedTrackModel, TrackModel, UserModel
+from app.api.models import (
+    ArtistModel,
+    AudioFeatureSummaryModel,
+    PlayedTrackModel,
+    TrackModel,
+    UserModel,
+)
 
 router = APIRouter(
     prefix='/user',
@@ -20,6 +34,43 @@ router = APIRouter(
 )
 
 
+def get_timezone(name: str) -> Optional[tzinfo]:
+    """Gets the IANA timezone `name`, None if it is not one, as a file path."""
+    if name not in get_zonefile_instance().zones:
+        return None
+    return gettz(name)
+
+
+def day_start_utc(day: date, tz: tzinfo) -> datetime:
+    """Converts the midnight of `day` in `tz` to a naive utc datetime."""
+    start = datetime.combine(day, time(), tzinfo=tz)
+    return start.astimezone(UTC).replace(tzinfo=None)
+
+
+def played_tracks_query(
+    user_id: str, start_date: Optional[date], end_date: Optional[date], tz: tzinfo
+) -> Dict:
+    """Builds the played tracks filters of the user between the days in `tz`."""
+    query = {'user': user_id}
+    if start_date:
+        query['played_at__gte'] = day_start_utc(start_date, tz)
+    if end_date:
+        query['played_at__lt'] = day_start_utc(end_date, tz)
+    return query
+
+
+def daily_plays_query(
+    user_id: str, start_date: Optional[date], end_date: Optional[date]
+) -> Dict:
+    """Builds the daily plays filters of the user between the dates."""
+    query = {'user': user_id}
+    if start_date:
+        query['day__gte'] = start_date
+    if end_date:
+        query['day__lt'] = end_date
+    return query
+
+
 @router.get('/me', response_model=UserModel)
 async def me(
     current_user: UserModel = Security(get_current_user, scopes=['user'])  # noqa:B008
@@ -28,35 +79,104 @@ async def me(
     return current_user
 
 
-@router.get('/played-tracks', response_model=List[PlayedTrackModel])
+@router.get(
+    '/played-tracks',
+    response_model=List[PlayedTrackModel],
+    responses={200: {'content': {'application/x-ndjson': {}}}}
+)
 async def played_tracks(
+    response: Response,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    timezone: str = Query(  # noqa: B008
+        'UTC', description='Timezone of the dates, e.g. America/Sao_Paulo'
+    ),
+    limit: Optional[int] = Query(None, ge=1, le=1000),  # noqa: B008
+    cursor: Optional[str] = Query(  # noqa: B008
+        None, description='X-Next-Cursor header of the previous page'
+    ),
+    stream: bool = Query(  # noqa: B008
+        False, description='Stream all played tracks as newline delimited json'
+    ),
     current_user: UserModel = Security(get_current_user, scopes=['user'])  # noqa:B008
 ):
-    """User played tracks."""
-    query = {'user': current_user.id}
-    if start_date:
-        query = {'played_at__gt': start_date.strftime('%Y-%m-%dT%H:%M:%S')}
-    if end_date:
-        query = {'played_at__lt': end_date.strftime('%Y-%m-%dT%H:%M:%S')}
-    return await get_played_tracks(query)
+    """
+    User played tracks, ordered by played at.
+
+    Returns the plays from the start of `start_date` up to the start of
+    `end_date`, excluded, with the days starting at midnight in `timezone`.
+    Pages are requested with `limit`. When there may be more played tracks the
+    `X-Next-Cursor` header holds the `cursor` of the next page.
+    """
+    tz = get_timezone(timezone)
+    if tz is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid timezone'
+        )
+    query = played_tracks_query(current_user.id, start_date, end_date, tz)
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor'
+            )
+    if stream:
+        return StreamingResponse(
+            (f'{PlayedTrackModel(**pt).json()}\n'
+             async for pt in iterate_played_tracks(query, cursor)),
+            media_type='application/x-ndjson'
+        )
+    played_tracks = await get_played_tracks(query, limit, cursor)
+    if limit is not None and len(played_tracks) == limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(played_tracks[-1])
+    return played_tracks
 
 
 @router.get('/tracks', response_model=List[TrackModel])
 async def tracks(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1),  # noqa: B008
+    offset: int = Query(0, ge=0),  # noqa: B008
     current_user: UserModel = Security(get_current_user, scopes=['user'])  # noqa:B008
 ):
-    """User played tracks."""
-    return await get_tracks({'user': current_user.id})
+    """
+    User played tracks, ordered by play count.
+
+    Counts plays from `start_date` up to `end_date`, excluded.
+    """
+    query = daily_plays_query(current_user.id, start_date, end_date)
+    return await cached_response(
+        request,
+        List[TrackModel],
+        lambda: get_tracks(query=query, limit=limit, offset=offset),
+        current_user.id
+    )
 
 
 @router.get('/artists', response_model=List[ArtistModel])
 async def artists(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1),  # noqa: B008
+    offset: int = Query(0, ge=0),  # noqa: B008
     current_user: UserModel = Security(get_current_user, scopes=['user'])  # noqa:B008
 ):
-    """User played artists."""
-    return await get_artists({'user': current_user.id})
+    """
+    User played artists, ordered by play count.
+
+    Counts plays from `start_date` up to `end_date`, excluded.
+    """
+    query = daily_plays_query(current_user.id, start_date, end_date)
+    return await cached_response(
+        request,
+        List[ArtistModel],
+        lambda: get_artists(query=query, limit=limit, offset=offset),
+        current_user.id
+    )
 
 
 @router.get('/audio-features', response_model=Dict[str, List[Union[float, int]]])
@@ -72,9 +192,47 @@ async def audio_features(
     return await get_audio_features({'user': current_user.id}, features)
 
 
+@router.get(
+    '/audio-features/summary', response_model=Dict[str, AudioFeatureSummaryModel]
+)
+async def audio_features_summary(
+    request: Request,
+    features: List[str] = Query(  # noqa: B008
+        AUDIO_FEATURES,
+        description='List of features to get. Accepted values in default'
+    ),
+    bins: int = Query(10, ge=1, le=100),  # noqa: B008
+    current_user: UserModel = Security(get_current_user, scopes=['user'])  # noqa:B008
+):
+    """User played tracks audio features statistics and histograms."""
+    features = [*(set(AUDIO_FEATURES) & set(features))]
+    return await cached_response(
+        request,
+        Dict[str, AudioFeatureSummaryModel],
+        lambda: get_audio_features_summary(
+            {'user': current_user.id}, features=features, bins=bins
+        ),
+        current_user.id
+    )
+
+
 @router.get('/genres', response_model=Dict[str, int])
 async def genres(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1),  # noqa: B008
     current_user: UserModel = Security(get_current_user, scopes=['user'])  # noqa:B008
 ):
-    """User played tracks artists genres."""
-    return await get_genres({'user': current_user.id})
+    """
+    User played tracks artists genres, ordered by play count.
+
+    Counts plays from `start_date` up to `end_date`, excluded.
+    """
+    query = daily_plays_query(current_user.id, start_date, end_date)
+    return await cached_response(
+        request,
+        Dict[str, int],
+        lambda: get_genres(query=query, limit=limit),
+        current_user.id
+    )
@@ -0,0 +1,110 @@
+import os
+from typing import Any, Dict, List, Optional, Text, Type
+
+import ormar
+from sqlalchemy.dialects.postgresql import insert
+
+COPY_MIN_ROWS = int(os.getenv('APP_DB_COPY_MIN_ROWS', 5000))
+
+
+async def copy_ignore(
+    model: Type[ormar.Model], rows: List[Dict], returning: Optional[Text] = None
+) -> List[Any]:
+    """
+    Inserts rows with binary COPY, skipping the ones that conflict with existing rows.
+
+    Rows are copied into a temporary staging table with asyncpg
+    `copy_records_to_table`, then merged into the model table with a single
+    `INSERT ... SELECT ... ON CONFLICT DO NOTHING`. Only for the asyncpg backend.
+
+    Parameters
+    ----------
+    model : ormar.Model
+        model of the table to insert into
+    rows : list of dict
+        rows to insert, keyed by column name, all with the same keys
+    returning : str, optional
+        column to return from the inserted rows, by default None
+
+    Returns
+    -------
+    list
+        `returning` values of the rows actually inserted, empty if not given
+    """
+    if not rows:
+        return []
+    table = model.Meta.table.name
+    staging = f'staging_{table}'
+    columns = list(rows[0])
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    merge = (
+        f'INSERT INTO "{table}" ({column_list}) SELECT {column_list} FROM "{staging}" '
+        'ON CONFLICT DO NOTHING'
+    )
+    if returning is not None:
+        merge += f' RETURNING "{returning}"'
+    async with model.Meta.database.connection() as connection:
+        async with connection.transaction():
+            raw_connection = connection.raw_connection
+            await raw_connection.execute(
+                f'CREATE TEMP TABLE "{staging}" AS '
+                f'SELECT {column_list} FROM "{table}" WITH NO DATA'
+            )
+            await raw_connection.copy_records_to_table(
+                staging,
+                records=[tuple(row.get(column) for column in columns) for row in rows],
+                columns=columns,
+            )
+            inserted = await raw_connection.fetch(merge)
+            await raw_connection.execute(f'DROP TABLE "{staging}"')
+    if returning is None:
+        return []
+    return [row[returning] for row in inserted]
+
+
+async def insert_ignore(
+    model: Type[ormar.Model],
+    rows: List[Dict],
+    chunk_size: Optional[int] = 1000,
+    returning: Optional[Text] = None,
+) -> List[Any]:
+    """
+    Inserts rows skipping the ones that conflict with existing rows.
+
+    Uses multi row `INSERT ... ON CONFLICT DO NOTHING` statements, or
+    `copy_ignore` for at least `COPY_MIN_ROWS` rows on postgresql.
+
+    Parameters
+    ----------
+    model : ormar.Model
+        model of the table to insert into
+    rows : list of dict
+        rows to insert, keyed by column name
+    chunk_size : int, optional
+        maximum number of rows per statement, by default 1000
+    returning : str, optional
+        column to return from the inserted rows, by default None
+
+    Returns
+    -------
+    list
+        `returning` values of the rows actually inserted, empty if not given
+    """
+    table = model.Meta.table
+    database = model.Meta.database
+    url = database.url
+    if (
+        len(rows) >= COPY_MIN_ROWS
+        and url.dialect.startswith('postgres')
+        and url.driver in ('', 'asyncpg')
+    ):
+        return await copy_ignore(model, rows, returning=returning)
+    inserted = []
+    for i in range(0, len(rows), chunk_size):
+        query = insert(table).values(rows[i: i + chunk_size]).on_conflict_do_nothing()
+        if returning is None:
+            await database.execute(query)
+        else:
+            result = await database.fetch_all(query.returning(table.c[returning]))
+            inserted.extend(row[returning] for row in result)
+    return inserted
@@ -1,4 +1,6 @@
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
 
 import databases
 import sqlalchemy
@@ -10,7 +12,96 @@ DB_HOST = os.getenv('APP_DB_HOST')
 DB_PORT = os.getenv('APP_DB_PORT')
 DB_DATABASE = os.getenv('APP_DB_DATABASE')
 
+DB_MIN_POOL_SIZE = int(os.getenv('APP_DB_MIN_POOL_SIZE', 1))
+DB_MAX_POOL_SIZE = int(os.getenv('APP_DB_MAX_POOL_SIZE', 10))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('APP_DB_STATEMENT_CACHE_SIZE', 100))
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = float(
+    os.getenv('APP_DB_MAX_INACTIVE_CONNECTION_LIFETIME', 300)
+)
+DB_PGBOUNCER = os.getenv('APP_DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
 DB_URL = f'{DB_CONNECTOR}://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}'
 
-db: databases.Database = databases.Database(DB_URL)
+
+def get_pool_options() -> Dict:
+    """
+    Gets the connection pool options of the asyncpg backend.
+
+    In PgBouncer mode the prepared statements cache is disabled, since
+    statements prepared on a server connection are not available after
+    PgBouncer hands the client another one.
+
+    Returns
+    -------
+    dict
+        `asyncpg.create_pool` arguments
+    """
+    if not (DB_CONNECTOR or '').startswith('postgres'):
+        return {}
+    return {
+        'min_size': DB_MIN_POOL_SIZE,
+        'max_size': DB_MAX_POOL_SIZE,
+        'statement_cache_size': 0 if DB_PGBOUNCER else DB_STATEMENT_CACHE_SIZE,
+        'max_inactive_connection_lifetime': DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+    }
+
+
+db: databases.Database = databases.Database(DB_URL, **get_pool_options())
 metadata: sqlalchemy.MetaData = sqlalchemy.MetaData()
+
+
+@asynccontextmanager
+async def connect(
+    database: databases.Database = db
+) -> AsyncIterator[databases.Database]:
+    """
+    Connects to the database for the duration of the block.
+
+    If the database is already connected the existing pool is reused and left
+    open, so nested tasks share the connections of the outermost block.
+
+    Parameters
+    ----------
+    database : databases.Database, optional
+        database to connect, by default db
+
+    Yields
+    ------
+    databases.Database
+        connected database
+    """
+    if database.is_connected:
+        yield database
+        return
+    await database.connect()
+    try:
+        yield database
+    finally:
+        await database.disconnect()
+
+
+@asynccontextmanager
+async def transaction(
+    database: databases.Database = db
+) -> AsyncIterator[databases.core.Connection]:
+    """
+    Runs the block in a transaction on the connection of the current task.
+
+    `databases.Database.transaction` may start the transaction on a new
+    connection when the task already holds one, so the queries of the block,
+    that use the task connection, would run outside of it.
+    Nested blocks use savepoints.
+
+    Parameters
+    ----------
+    database : databases.Database, optional
+        database to run the transaction on, by default db
+
+    Yields
+    ------
+    databases.core.Connection
+        connection running the transaction
+    """
+    async with database.connection() as connection:
+        async with connection.transaction():
+            yield connection
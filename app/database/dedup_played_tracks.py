@@ -0,0 +1,29 @@
+import asyncio
+
+from app.database.db import connect, db
+from app.database.schema import User
+from app.utils.logger import logger
+
+DEDUP_QUERY = '''
+DELETE FROM playedtracks a
+USING playedtracks b
+WHERE a."user" = :user AND b."user" = a."user"
+AND a.track = b.track AND a.played_at = b.played_at AND a.id > b.id
+RETURNING a.id
+'''
+
+
+async def main():
+    """Removes duplicate played tracks, one user at a time."""
+    async with connect():
+        users = await User.objects.fields(['id']).all()
+        total = 0
+        for user in users:
+            deleted = await db.fetch_all(DEDUP_QUERY, {'user': user.id})
+            if deleted:
+                logger.info(f'Removed {len(deleted)} duplicate plays of user {user.id}.')
+            total += len(deleted)
+        logger.info(f'Removed {total} duplicate plays.')
+
+if __name__ == '__main__':
+    asyncio.run(main())
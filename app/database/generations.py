@@ -0,0 +1,42 @@
+from typing import Optional, Text
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.schema import CacheGeneration, db
+
+ETL_GENERATION = 'etl'
+
+
+async def get_generation(name: Optional[Text] = ETL_GENERATION) -> int:
+    """
+    Gets the current cache generation.
+
+    Parameters
+    ----------
+    name : str, optional
+        generation name, by default ETL_GENERATION
+
+    Returns
+    -------
+    int
+        generation number, 0 if never increased
+    """
+    generation = await CacheGeneration.objects.get_or_none(name=name)
+    return generation.value if generation else 0
+
+
+async def bump_generation(name: Optional[Text] = ETL_GENERATION):
+    """
+    Increases the cache generation, invalidating the cached responses.
+
+    Parameters
+    ----------
+    name : str, optional
+        generation name, by default ETL_GENERATION
+    """
+    table = CacheGeneration.Meta.table
+    query = insert(table).values(name=name, value=1)
+    query = query.on_conflict_do_update(
+        index_elements=['name'], set_={'value': table.c.value + 1}
+    )
+    await db.execute(query)
@@ -1,7 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 import ormar
+import sqlalchemy
 
 from app.database.db import db, metadata
 
@@ -53,6 +54,18 @@ class UserToken(ormar.Model):
         id: int, primary key
         user: User, foreign key
         access_token: str
+        played_after: int, optional
+            unix timestamp in milliseconds of the last saved play
+        last_poll_plays: int, optional
+            number of plays returned by the last fetch
+        expires_at: int, optional
+            unix timestamp in milliseconds the access token expires
+        polled_at: int, optional
+            unix timestamp in milliseconds of the last fetch
+        heavy_listener: bool
+            whether the user plays enough tracks to be fetched hourly
+        low_rate_polls: int
+            number of fetches in a row of a heavy listener below the heavy rate
     """
 
     class Meta(BaseMeta):
@@ -61,6 +74,12 @@ class UserToken(ormar.Model):
     id: str = ormar.Integer(primary_key=True, autoincrement=True)
     user: User = ormar.ForeignKey(User)
     access_token: Optional[str] = ormar.Text(nullable=True)
+    played_after: Optional[int] = ormar.BigInteger(nullable=True)
+    last_poll_plays: Optional[int] = ormar.Integer(nullable=True)
+    expires_at: Optional[int] = ormar.BigInteger(nullable=True)
+    polled_at: Optional[int] = ormar.BigInteger(nullable=True)
+    heavy_listener: bool = ormar.Boolean(default=False, server_default=sqlalchemy.false())
+    low_rate_polls: int = ormar.Integer(default=0, server_default='0')
 
 
 class Track(ormar.Model):
@@ -161,10 +180,12 @@ class TrackArtist(ormar.Model):
         id: str, primary key
         artist: Artist, foreign key
         track: Track, foreign key
+
+    A track is linked to an artist only once.
     """
 
     class Meta(BaseMeta):
-        pass
+        constraints = [ormar.UniqueColumns('track', 'artist')]
 
     id: str = ormar.Integer(primary_key=True, autoincrement=True)
     artist: Artist = ormar.ForeignKey(Artist)
@@ -181,12 +202,72 @@ class PlayedTrack(ormar.Model):
         user: User, foreign key
         track: Track, foreign key
         played_at: datetime
+
+    A track is played by an user only once at a given time.
     """
 
     class Meta(BaseMeta):
-        pass
+        constraints = [ormar.UniqueColumns('user', 'track', 'played_at')]
 
     id: int = ormar.Integer(primary_key=True, autoincrement=True)
     user: User = ormar.ForeignKey(User)
     track: Track = ormar.ForeignKey(Track)
     played_at: datetime = ormar.DateTime()
+
+
+class DailyPlay(ormar.Model):
+    """
+    `daily_plays` table mapping, rollup of `played_tracks` by user, day and track.
+
+    Attributes
+    ----------
+        id: int, primary key
+        user: User, foreign key
+        day: date
+        track: Track, foreign key
+        plays: int
+            number of times the track was played on the day
+        duration_ms: int
+            total duration of the plays
+    """
+
+    class Meta(BaseMeta):
+        constraints = [ormar.UniqueColumns('user', 'day', 'track')]
+
+    id: int = ormar.Integer(primary_key=True, autoincrement=True)
+    user: User = ormar.ForeignKey(User)
+    day: date = ormar.Date()
+    track: Track = ormar.ForeignKey(Track)
+    plays: int = ormar.Integer()
+    duration_ms: int = ormar.BigInteger()
+
+
+class CacheGeneration(ormar.Model):
+    """
+    `cache_generations` table mapping.
+
+    Cached responses are only valid for the generation they were created on.
+
+    Attributes
+    ----------
+        name: str, primary key
+        value: int
+            generation number, increased when the data changes
+    """
+
+    class Meta(BaseMeta):
+        pass
+
+    name: str = ormar.Text(primary_key=True)
+    value: int = ormar.BigInteger()
+
+
+sqlalchemy.Index(
+    'ix_playedtracks_user_played_at',
+    PlayedTrack.Meta.table.c.user,
+    PlayedTrack.Meta.table.c.played_at,
+    PlayedTrack.Meta.table.c.id,
+)
+sqlalchemy.Index('ix_trackartists_track', TrackArtist.Meta.table.c.track)
+sqlalchemy.Index('ix_trackartists_artist', TrackArtist.Meta.table.c.artist)
+sqlalchemy.Index('ix_genres_artist', Genre.Meta.table.c.artist)
@@ -1,14 +1,94 @@
+import itertools
 import os
-import random
-from typing import Dict, List, Optional, Text
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Text
 
+import httpx
+
+from app.utils.cache import TTLCache
 from app.utils.data import select_dict_keys
 from app.utils.logger import logger
-from app.utils.misc import async_request
+from app.utils.misc import gather_with_concurrency
+from app.utils.ratelimit import CircuitBreaker, TokenBucket, retry_request
 
 B64_CLIENT = os.getenv('B64_CLIENT')
 REDIRECT_URI = os.getenv('REDIRECT_URI')
 OAUTH_TOKEN_URL = os.getenv('OAUTH_TOKEN_URL')
+MAX_CONCURRENT_REQUESTS = int(os.getenv('SPOTIFY_MAX_CONCURRENT_REQUESTS', 10))
+MAX_RETRIES = int(os.getenv('SPOTIFY_MAX_RETRIES', 5))
+RATE_LIMIT = float(os.getenv('SPOTIFY_RATE_LIMIT', 20))
+TOKEN_RATE_LIMIT = float(os.getenv('SPOTIFY_TOKEN_RATE_LIMIT', 5))
+TOKEN_BUCKETS_MAXSIZE = int(os.getenv('SPOTIFY_TOKEN_BUCKETS_MAXSIZE', 10000))
+TOKEN_BUCKETS_TTL = 3600
+
+_global_bucket = TokenBucket(RATE_LIMIT)
+_token_buckets = TTLCache(maxsize=TOKEN_BUCKETS_MAXSIZE, ttl=TOKEN_BUCKETS_TTL)
+_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('SPOTIFY_BREAKER_THRESHOLD', 10)),
+    reset_timeout=float(os.getenv('SPOTIFY_BREAKER_TIMEOUT', 30)),
+)
+
+
+async def spotify_request(
+    method: Text,
+    url: Text,
+    access_token: Optional[Text] = None,
+    on_unauthorized: Optional[Callable[[], Awaitable[Text]]] = None,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    Makes a rate limited request to spotify, retrying throttled requests.
+
+    Every request takes from the global rate limit and, when `access_token` is
+    given, from that token rate limit. All requests share a circuit breaker.
+    If the request is answered with 401 and `on_unauthorized` is given, it is
+    called to get a new access token and the request is sent once more, the
+    new token keeps the rate limit of the old one.
+    Token rate limits are kept for an hour, the token lifetime, and at most
+    `TOKEN_BUCKETS_MAXSIZE` of them, the least recently used are dropped.
+
+    Parameters
+    ----------
+    method : str
+        http method
+    url : str
+        request url
+    access_token : str, optional
+        spotify access token sent as bearer authorization, by default None
+    on_unauthorized : callable, optional
+        coroutine function returning a refreshed access token, by default None
+    **kwargs
+        extra arguments to `async_request`
+
+    Returns
+    -------
+    httpx.Response
+        successful response
+    """
+    if on_unauthorized is not None:
+        try:
+            return await spotify_request(method, url, access_token=access_token, **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != httpx.codes.UNAUTHORIZED:
+                raise
+            logger.info(f'{method} {url} unauthorized. refreshing access token')
+            bucket = _token_buckets.get(access_token)
+            access_token = await on_unauthorized()
+            if bucket is not None:
+                _token_buckets.set(access_token, bucket)
+    buckets = [_global_bucket]
+    if access_token is not None:
+        bucket = _token_buckets.get(access_token)
+        if bucket is None:
+            bucket = TokenBucket(TOKEN_RATE_LIMIT)
+            _token_buckets.set(access_token, bucket)
+        buckets.append(bucket)
+        kwargs['headers'] = {
+            **(kwargs.get('headers') or {}),
+            'Authorization': f'Bearer {access_token}'
+        }
+    return await retry_request(
+        method, url, buckets=buckets, breaker=_breaker, max_retries=MAX_RETRIES, **kwargs
+    )
 
 
 async def get_refresh_token(code: Text) -> Dict[str, str]:
@@ -33,7 +113,7 @@ async def get_refresh_token(code: Text) -> Dict[str, str]:
     headers = {
         'Authorization': f'Basic {B64_CLIENT}'
     }
-    response = await async_request(
+    response = await spotify_request(
         'post',
         OAUTH_TOKEN_URL,
         data=payload,
@@ -44,7 +124,7 @@ async def get_refresh_token(code: Text) -> Dict[str, str]:
     return tokens
 
 
-async def get_access_token(refresh_token: Text) -> Text:
+async def get_access_token(refresh_token: Text) -> Dict[str, Any]:
     """
     Gets a new access token using the refresh token.
 
@@ -55,8 +135,8 @@ async def get_access_token(refresh_token: Text) -> Text:
 
     Returns
     -------
-    str
-        spotify user access token
+    dict
+        spotify user access token and its duration in seconds, `expires_in`
     """
     payload = {
         'grant_type': 'refresh_token',
@@ -65,14 +145,14 @@ async def get_access_token(refresh_token: Text) -> Text:
     headers = {
         'Authorization': f'Basic {B64_CLIENT}'
     }
-    response = await async_request(
+    response = await spotify_request(
         'post',
         OAUTH_TOKEN_URL,
         data=payload,
         headers=headers,
     )
     token = response.json()
-    return token.get('access_token')
+    return select_dict_keys(token, ['access_token', 'expires_in'])
 
 
 async def get_user_me(access_token: Text) -> Dict:
@@ -89,17 +169,18 @@ async def get_user_me(access_token: Text) -> Dict:
     dict
         user information
     """
-    response = await async_request(
-        'get',
-        'https://api.spotify.com/v1/me',
-        headers={'Authorization': f'Bearer {access_token}'}
+    response = await spotify_request(
+        'get', 'https://api.spotify.com/v1/me', access_token=access_token
     )
     user = response.json()
     return user
 
 
 async def get_recently_played(
-    access_token: Text, after_timestamp: Text, limit: Optional[int] = 50
+    access_token: Text,
+    after_timestamp: Text,
+    limit: Optional[int] = 50,
+    on_unauthorized: Optional[Callable[[], Awaitable[Text]]] = None,
 ) -> List[Dict]:
     """
     Gets the user most recently played music since `after_timestamp`.
@@ -112,6 +193,9 @@ async def get_recently_played(
         unix timestamp
     limit : int, optional
         maximum number tracks per requests, by default 50
+    on_unauthorized : callable, optional
+        coroutine function returning a refreshed access token, called when
+        `access_token` is rejected, by default None
 
     Returns
     -------
@@ -125,11 +209,18 @@ async def get_recently_played(
     url = 'https://api.spotify.com/v1/me/player/recently-played?limit={}&after={}'.format(
         limit, after_timestamp
     )
+
+    async def refresh_access_token():
+        nonlocal access_token
+        access_token = await on_unauthorized()
+        return access_token
+
     while url:
-        response = await async_request(
+        response = await spotify_request(
             'get',
             url,
-            headers={'Authorization': f'Bearer {access_token}'}
+            access_token=access_token,
+            on_unauthorized=refresh_access_token if on_unauthorized else None,
         )
         resp_json = response.json()
         tracks.append(resp_json.get('items') or [])
@@ -138,8 +229,97 @@ async def get_recently_played(
     return tracks
 
 
+async def get_several_items(
+    url: Text,
+    key: Text,
+    access_tokens: List[Text],
+    ids: List[Text],
+    limit: int
+) -> List[Dict]:
+    """
+    Gets the items from `ids` in concurrent chunks of `limit` ids.
+
+    Chunks are assigned to the access tokens in round robin, so requests are
+    spread evenly across the tokens. At most `MAX_CONCURRENT_REQUESTS` chunks
+    are requested at once. Chunks that fail after all retries are logged and
+    left out of the result.
+
+    Parameters
+    ----------
+    url : str
+        endpoint url with a placeholder for the comma separated ids
+    key : str
+        key of the items on the response
+    access_tokens : list of str
+        spotify access tokens
+    ids : list of str
+        list of item ids
+    limit : int
+        maximum number of items per request
+
+    Returns
+    -------
+    list of dict
+        list with the items, in the same order as `ids`
+    """
+    tokens = itertools.cycle(access_tokens)
+
+    async def get_chunk(chunk_ids, access_token):
+        response = await spotify_request(
+            'get', url.format(','.join(chunk_ids)), access_token=access_token
+        )
+        resp_json = response.json()
+        return resp_json.get(key) or []
+
+    chunks = await gather_with_concurrency(
+        MAX_CONCURRENT_REQUESTS,
+        *(get_chunk(ids[i: i + limit], next(tokens))
+          for i in range(0, len(ids), limit)),
+        return_exceptions=True
+    )
+    items = []
+    for chunk in chunks:
+        if isinstance(chunk, Exception):
+            logger.error(f'failed to fetch {key} chunk: {chunk!r}')
+            continue
+        items.extend(item for item in chunk if item)
+    return items
+
+
+async def get_tracks(
+    access_tokens: List[Text], track_ids: List[Text], limit: Optional[int] = 50
+) -> List[Dict]:
+    """
+    Gets the tracks info from the `track_ids`.
+
+    Parameters
+    ----------
+    access_tokens : list of str
+        spotify access token
+    track_ids : list of str
+        list of track ids
+    limit : int, optional
+        maximum number of tracks per request, by default 50
+
+    Returns
+    -------
+    list of dict
+        list with the tracks info
+    """
+    if not (0 < limit <= 50):
+        limit = 50
+        logger.warning(f'limit must be at most {limit}. setting value to {limit}')
+    return await get_several_items(
+        'https://api.spotify.com/v1/tracks?ids={}',
+        'tracks',
+        access_tokens,
+        track_ids,
+        limit
+    )
+
+
 async def get_audio_features(
-    access_tokens: Text, track_ids: List[Text], limit: Optional[int] = 100
+    access_tokens: List[Text], track_ids: List[Text], limit: Optional[int] = 100
 ) -> List[Dict]:
     """
     Gets the audio features from the `track_ids`.
@@ -161,27 +341,17 @@ async def get_audio_features(
     if not (0 < limit <= 100):
         limit = 100
         logger.warning(f'limit must be at most {limit}. setting value to {limit}')
-    tracks = []
-    size = len(track_ids)
-    url = 'https://api.spotify.com/v1/audio-features?ids={}'
-    for i in range(0, size, limit):
-        current_tracks = ','.join(track_ids[i: i + limit])
-        access_token = random.choice(access_tokens)
-        response = await async_request(
-            'get',
-            url.format(current_tracks),
-            headers={'Authorization': f'Bearer {access_token}'}
-        )
-        resp_json = response.json()
-        audio_features = resp_json.get('audio_features')
-        if audio_features:
-            tracks.append(audio_features)
-    tracks = sum(tracks, [])
-    return tracks
+    return await get_several_items(
+        'https://api.spotify.com/v1/audio-features?ids={}',
+        'audio_features',
+        access_tokens,
+        track_ids,
+        limit
+    )
 
 
 async def get_artists(
-    access_tokens: Text, artist_ids: List[Text], limit: Optional[int] = 100
+    access_tokens: List[Text], artist_ids: List[Text], limit: Optional[int] = 100
 ):
     """
     Gets the artists info from the `artist_ids`.
@@ -203,20 +373,10 @@ async def get_artists(
     if not (0 < limit <= 100):
         limit = 100
         logger.warning(f'limit must be at most {limit}. setting value to {limit}')
-    artists = []
-    size = len(artist_ids)
-    url = 'https://api.spotify.com/v1/artists?ids={}'
-    for i in range(0, size, limit):
-        current_artists = ','.join(artist_ids[i: i + limit])
-        access_token = random.choice(access_tokens)
-        response = await async_request(
-            'get',
-            url.format(current_artists),
-            headers={'Authorization': f'Bearer {access_token}'}
-        )
-        resp_json = response.json()
-        artists_info = resp_json.get('artists')
-        if artists_info:
-            artists.append(artists_info)
-    artists = sum(artists, [])
-    return artists
+    return await get_several_items(
+        'https://api.spotify.com/v1/artists?ids={}',
+        'artists',
+        access_tokens,
+        artist_ids,
+        limit
+    )
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import os
+from typing import Dict, Iterator, List, Optional, Text
+
+import dateutil.parser
+from dateutil.tz import UTC
+
+from app.database.bulk import insert_ignore
+from app.database.db import connect, transaction
+from app.database.generations import bump_generation
+from app.database.schema import PlayedTrack, Track, User
+from app.spotify.tasks import (
+    get_artist_info,
+    get_track_info,
+    update_access_tokens,
+    update_played_days,
+)
+from app.utils.data import iter_batches, iter_json_array, iter_unique
+from app.utils.logger import logger
+from app.utils.misc import close_clients
+
+IMPORT_BATCH_SIZE = int(os.getenv('SPOTIFY_IMPORT_BATCH_SIZE', 10000))
+MIN_MS_PLAYED = int(os.getenv('SPOTIFY_IMPORT_MIN_MS_PLAYED', 30000))
+
+
+def parse_streaming_record(
+    record: Dict, min_ms_played: Optional[int] = MIN_MS_PLAYED
+) -> Optional[Dict]:
+    """
+    Maps a streaming history record to a play.
+
+    Only records of the extended streaming history, `endsong_*.json` or
+    `Streaming_History_Audio_*.json`, have the track uri. Records without it,
+    as the ones of `StreamingHistory*.json`, podcasts and local files, are
+    skipped, as are records without a valid `ts` and plays shorter than
+    `min_ms_played`.
+
+    Parameters
+    ----------
+    record : dict
+        streaming history record
+    min_ms_played : int, optional
+        minimum milliseconds played to count as a play, by default MIN_MS_PLAYED
+
+    Returns
+    -------
+    dict, optional
+        play with `track_id`, `track_name` and `played_at` as naive utc
+        datetime, None if the record is skipped
+    """
+    uri = record.get('spotify_track_uri')
+    if not uri or not uri.startswith('spotify:track:'):
+        return None
+    if (record.get('ms_played') or 0) < min_ms_played:
+        return None
+    try:
+        played_at = dateutil.parser.parse(record.get('ts'))
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return {
+        'track_id': uri.rsplit(':', 1)[-1],
+        'track_name': record.get('master_metadata_track_name') or '',
+        'played_at': played_at.astimezone(UTC).replace(tzinfo=None),
+    }
+
+
+def iter_streaming_history(
+    paths: List[Text], min_ms_played: Optional[int] = MIN_MS_PLAYED
+) -> Iterator[Dict]:
+    """
+    Yields the plays of the streaming history files, one record at a time.
+
+    Parameters
+    ----------
+    paths : list of str
+        streaming history json files
+    min_ms_played : int, optional
+        minimum milliseconds played to count as a play, by default MIN_MS_PLAYED
+
+    Yields
+    ------
+    dict
+        plays, see `parse_streaming_record`
+    """
+    for path in paths:
+        logger.info(f'reading {path}')
+        skipped = 0
+        with open(path, encoding='utf-8') as file:
+            for record in iter_json_array(file):
+                play = parse_streaming_record(record, min_ms_played)
+                if play is None:
+                    skipped += 1
+                    continue
+                yield play
+        if skipped:
+            logger.warning(
+                f'skipped {skipped} records of {path} without a track or time, '
+                'or too short'
+            )
+
+
+async def save_streaming_history_batch(user_id: Text, plays: List[Dict]):
+    """
+    Saves a batch of imported plays in one transaction.
+
+    Tracks not on `tracks` are saved with only their name, their information
+    and artists are fetched later by `get_track_info`.
+    The days of the plays are updated on `daily_plays` in the same transaction.
+
+    Parameters
+    ----------
+    user_id : str
+        user that played the tracks
+    plays : list of dict
+        plays, see `parse_streaming_record`
+    """
+    tracks = [
+        {
+            'id': play.get('track_id'),
+            'name': play.get('track_name'),
+            'href': f'https://api.spotify.com/v1/tracks/{play.get("track_id")}',
+            'uri': f'spotify:track:{play.get("track_id")}',
+            'popularity': 0,
+        }
+        for play in iter_unique(plays, 'track_id')
+    ]
+    played_tracks = [
+        {
+            'user': user_id,
+            'track': play.get('track_id'),
+            'played_at': play.get('played_at'),
+        }
+        for play in plays
+    ]
+    async with transaction():
+        await insert_ignore(Track, tracks)
+        await insert_ignore(PlayedTrack, played_tracks)
+        await update_played_days(played_tracks)
+
+
+async def import_streaming_history(
+    user_id: Text,
+    paths: List[Text],
+    batch_size: Optional[int] = IMPORT_BATCH_SIZE,
+    min_ms_played: Optional[int] = MIN_MS_PLAYED,
+    fetch_info: Optional[bool] = True,
+):
+    """
+    Imports the plays of spotify streaming history exports for a user.
+
+    Files are streamed and saved in batches of `batch_size` plays, so memory
+    does not depend on the size of the history. Plays already saved are
+    skipped, so importing the same files again is safe.
+    The cached api responses are invalidated once the plays are saved.
+    Then fetches the information of the new tracks and artists.
+
+    Parameters
+    ----------
+    user_id : str
+        user the history belongs to
+    paths : list of str
+        streaming history json files
+    batch_size : int, optional
+        number of plays saved at a time, by default IMPORT_BATCH_SIZE
+    min_ms_played : int, optional
+        minimum milliseconds played to count as a play, by default MIN_MS_PLAYED
+    fetch_info : bool, optional
+        fetch the tracks and artists information, by default True.
+        Otherwise it is fetched by the next ETL run, and the new tracks
+        durations are missing from `daily_plays` until then.
+
+    Raises
+    ------
+    ValueError
+        if the user does not exist
+    """
+    async with connect():
+        if await User.objects.get_or_none(id=user_id) is None:
+            raise ValueError(f'user {user_id} does not exist')
+        imported = 0
+        plays = iter_streaming_history(paths, min_ms_played)
+        for batch in iter_batches(plays, batch_size):
+            await save_streaming_history_batch(user_id, batch)
+            imported += len(batch)
+            logger.info(f'imported {imported} plays')
+        if not imported:
+            logger.warning('no plays to import')
+            return
+        await bump_generation()
+
+        if fetch_info:
+            await update_access_tokens()
+            await get_track_info()
+            await get_artist_info()
+
+
+async def main(args: Optional[List[Text]] = None):
+    """Imports spotify streaming history exports from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Imports spotify extended streaming history json files.'
+    )
+    parser.add_argument('user_id', help='user the history belongs to')
+    parser.add_argument('paths', nargs='+', help='endsong_*.json files')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--min-ms-played', type=int, default=MIN_MS_PLAYED)
+    parser.add_argument(
+        '--no-fetch-info',
+        dest='fetch_info',
+        action='store_false',
+        help='leave the tracks and artists information to the next ETL run',
+    )
+    args = parser.parse_args(args)
+    try:
+        await import_streaming_history(
+            args.user_id,
+            args.paths,
+            batch_size=args.batch_size,
+            min_ms_played=args.min_ms_played,
+            fetch_info=args.fetch_info,
+        )
+    finally:
+        await close_clients()
+
+if __name__ == '__main__':
+    asyncio.run(main())
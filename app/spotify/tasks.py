@@ -1,13 +1,40 @@
+import asyncio
 import datetime
+import os
+import time
+from collections import defaultdict
+from contextlib import suppress
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Text,
+    Tuple,
+)
 
 import dateutil.parser
-
+import ormar
+import sqlalchemy
+from dateutil.tz import UTC
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import Insert, insert
+
+from app.database.bulk import insert_ignore
+from app.database.db import connect, transaction
+from app.database.generations import bump_generation
 from app.database.schema import (
     Artist,
+    DailyPlay,
     Genre,
     PlayedTrack,
     Track,
     TrackArtist,
+    User,
     UserToken,
     db,
 )
@@ -16,153 +43,614 @@ from app.spotify.api import (
     get_artists,
     get_audio_features,
     get_recently_played,
+    get_tracks,
 )
-from app.utils.data import (
-    filter_duplicate_dicts_by_key,
-    rename_dict_keys,
-    select_dict_keys,
-)
+from app.utils.data import filter_duplicate_dicts_by_key, project_dicts, select_dict_keys
+from app.utils.logger import logger
+from app.utils.misc import gather_with_concurrency
+
+MAX_CONCURRENT_USERS = int(os.getenv('SPOTIFY_MAX_CONCURRENT_USERS', 10))
+HEAVY_LISTENER_RATE = float(os.getenv('SPOTIFY_HEAVY_LISTENER_RATE', 1.5))
+HEAVY_LISTENER_LOW_POLLS = int(os.getenv('SPOTIFY_HEAVY_LISTENER_LOW_POLLS', 24))
+DAILY_PLAYS_TRACKS_CHUNK = 1000
+DAILY_PLAYS_RANGES_CHUNK = 500
+TOKEN_REFRESH_MARGIN = int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', 600))
+PIPELINE_BATCH_SIZE = int(os.getenv('SPOTIFY_PIPELINE_BATCH_SIZE', 500))
+PIPELINE_QUEUE_SIZE = int(os.getenv('SPOTIFY_PIPELINE_QUEUE_SIZE', 20))
+
+
+async def refresh_access_token(token: UserToken) -> UserToken:
+    """
+    Fetches a new access token and its expiry time for the token user.
+
+    The token must have its user loaded, the changes are not saved.
+
+    Parameters
+    ----------
+    token : UserToken
+        token to refresh
+
+    Returns
+    -------
+    UserToken
+        refreshed token
+    """
+    response = await get_access_token(token.user.refresh_token)
+    token.access_token = response.get('access_token')
+    expires_in = response.get('expires_in') or 0
+    token.expires_at = int((time.time() + expires_in) * 1000)
+    return token
+
 
+def on_unauthorized_hook(token: UserToken) -> Callable[[], Awaitable[Text]]:
+    """
+    Creates the hook the spotify client calls when the token is rejected.
+
+    The hook refreshes the token and returns the new access token.
+
+    Parameters
+    ----------
+    token : UserToken
+        token used on the requests, with its user loaded
+
+    Returns
+    -------
+    callable
+        coroutine function returning a new access token
+    """
+    async def refresh():
+        await refresh_access_token(token)
+        return token.access_token
+
+    return refresh
 
-async def update_access_tokens():
+
+async def update_access_tokens(force: bool = False, heavy_listeners_only: bool = False):
+    """
+    Fetches new access_tokens for the users whose token is about to expire.
+
+    Gets `users.refresh_token` and updates `user_tokens`, at most
+    `MAX_CONCURRENT_USERS` users at a time.
+    Tokens are refreshed when they expire in less than `TOKEN_REFRESH_MARGIN`
+    seconds or have no expiry time. Users whose refresh fails are logged
+    and skipped.
+
+    Parameters
+    ----------
+    force : bool, optional
+        refresh all tokens, by default False
+    heavy_listeners_only : bool, optional
+        only refresh heavy listeners tokens, see `update_heavy_listener`,
+        by default False
     """
-    Fetches new access_tokens for all users.
+    async with connect():
+        tokens = UserToken.objects.select_related('user')
+        if heavy_listeners_only:
+            tokens = tokens.filter(heavy_listener=True)
+        if not force:
+            refresh_before = int((time.time() + TOKEN_REFRESH_MARGIN) * 1000)
+            tokens = tokens.filter(
+                ormar.or_(expires_at__isnull=True, expires_at__lt=refresh_before)
+            )
+        tokens = await tokens.all()
+        results = await gather_with_concurrency(
+            MAX_CONCURRENT_USERS,
+            *(refresh_access_token(token) for token in tokens),
+            return_exceptions=True
+        )
+        refreshed_tokens = []
+        for token, result in zip(tokens, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    f'failed to refresh access token for user {token.user.id}: {result!r}'
+                )
+                continue
+            refreshed_tokens.append(token)
+        if refreshed_tokens:
+            await UserToken.objects.bulk_update(
+                refreshed_tokens, columns=['access_token', 'expires_at']
+            )
+        logger.info(f'refreshed {len(refreshed_tokens)} of {len(tokens)} access tokens')
+
 
-    Gets `users.refresh_token` and updates `user_tokens`.
+def normalise_played_track(item: Dict, user_id: Text) -> Dict:
     """
-    async with db:
-        tokens = await UserToken.objects.select_related('user').all()
-        for token in tokens:
-            token.access_token = await get_access_token(
-                token.user.refresh_token
+    Keeps the fields of a recently played item that are saved.
+
+    Parameters
+    ----------
+    item : dict
+        spotify recently played item
+    user_id : str
+        user that played the track
+
+    Returns
+    -------
+    dict
+        play with `user_id`, `track_id`, `played_at` as naive utc datetime and
+        the `track` with its `artists`
+    """
+    track = item.get('track')
+    return {
+        'user_id': user_id,
+        'track_id': track.get('id'),
+        'played_at': dateutil.parser.parse(item.get('played_at')).replace(tzinfo=None),
+        'track': {
+            **select_dict_keys(track, ['id', 'name', 'href', 'uri', 'popularity']),
+            'artists': select_dict_keys(
+                track.get('artists'), ['id', 'name', 'href', 'uri']
+            ),
+        },
+    }
+
+
+def update_heavy_listener(token: UserToken, plays: int, polled_at: int):
+    """
+    Classifies the token user as heavy listener by the play rate of a fetch.
+
+    The rate is the number of plays per hour since the previous fetch, or over
+    the last day for the first one, counting at least one hour. A rate of at
+    least `HEAVY_LISTENER_RATE` makes the user a heavy listener. The user stops
+    being one after `HEAVY_LISTENER_LOW_POLLS` fetches in a row below it, so
+    quiet hours don't drop heavy listeners from the hourly fetch.
+    The changes are not saved.
+
+    Parameters
+    ----------
+    token : UserToken
+        token of the fetched user
+    plays : int
+        number of plays fetched
+    polled_at : int
+        unix timestamp in milliseconds of the fetch
+    """
+    hours = 24
+    if token.polled_at is not None:
+        hours = max((polled_at - token.polled_at) / 3600000, 1)
+    if plays / hours >= HEAVY_LISTENER_RATE:
+        token.heavy_listener = True
+        token.low_rate_polls = 0
+    elif token.heavy_listener:
+        token.low_rate_polls += 1
+        if token.low_rate_polls >= HEAVY_LISTENER_LOW_POLLS:
+            token.heavy_listener = False
+            token.low_rate_polls = 0
+    token.polled_at = polled_at
+    token.last_poll_plays = plays
+
+
+async def fetch_played_tracks(
+    tokens: List[UserToken], queue: asyncio.Queue, after_timestamp: int
+):
+    """
+    Fetches the users played tracks and puts them on `queue`.
+
+    At most `MAX_CONCURRENT_USERS` users are fetched at a time, and fetches
+    wait while the queue is full. Each user is put as a `(token, plays)` pair,
+    with the token cursors moved forward and the user classified by
+    `update_heavy_listener`, and None is put once all users are fetched.
+    Users whose fetch or normalisation fails are logged and skipped.
+    If cancelled None is not put, since nothing may be left reading the queue.
+
+    Parameters
+    ----------
+    tokens : list of UserToken
+        tokens of the users to fetch, with their users loaded
+    queue : asyncio.Queue
+        queue receiving the fetched users
+    after_timestamp : int
+        unix timestamp in milliseconds to fetch users never fetched from
+    """
+    async def fetch(token):
+        polled_at = int(time.time() * 1000)
+        try:
+            items = await get_recently_played(
+                token.access_token,
+                after_timestamp=token.played_after or after_timestamp,
+                on_unauthorized=on_unauthorized_hook(token),
             )
-        await UserToken.objects.bulk_update(tokens)
+            plays = [normalise_played_track(item, token.user.id) for item in items]
+            if plays:
+                token.played_after = max(
+                    int(play.get('played_at').replace(tzinfo=UTC).timestamp() * 1000)
+                    for play in plays
+                )
+            update_heavy_listener(token, len(plays), polled_at)
+        except Exception as e:
+            logger.error(f'failed to fetch played tracks for user {token.user.id}: {e!r}')
+            return False
+        await queue.put((token, plays))
+        return True
+
+    results = await gather_with_concurrency(
+        MAX_CONCURRENT_USERS, *(fetch(token) for token in tokens)
+    )
+    await queue.put(None)
+    failed_users = results.count(False)
+    if failed_users:
+        logger.warning(
+            f'played tracks fetch failed for {failed_users} of {len(tokens)} users'
+        )
 
 
-async def get_played_tracks():
+async def iter_played_tracks_batches(
+    queue: asyncio.Queue, batch_size: int
+) -> AsyncIterator[Tuple[List[UserToken], List[Dict]]]:
+    """
+    Gets the fetched users from `queue` in batches of about `batch_size` plays.
+
+    The plays of a user are never split across batches.
+
+    Parameters
+    ----------
+    queue : asyncio.Queue
+        queue filled by `fetch_played_tracks`
+    batch_size : int
+        minimum number of plays of a batch, except the last one
+
+    Yields
+    ------
+    tuple of list of UserToken and list of dict
+        tokens of the users in the batch and their plays
+    """
+    tokens, plays = [], []
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        token, user_plays = item
+        tokens.append(token)
+        plays.extend(user_plays)
+        if len(plays) >= batch_size:
+            yield tokens, plays
+            tokens, plays = [], []
+    if tokens:
+        yield tokens, plays
+
+
+async def save_played_tracks_batch(tokens: List[UserToken], plays: List[Dict]):
+    """
+    Saves a batch of plays and moves the users cursors forward in one transaction.
+
+    Artists, tracks, their links, plays and cursors are committed together,
+    so a failed batch leaves no partial state and its users are fetched
+    again from their previous cursor.
+
+    Parameters
+    ----------
+    tokens : list of UserToken
+        tokens of the users in the batch
+    plays : list of dict
+        normalised plays of the users
     """
-    Fetches users played tracks from the last day, adds new artists and new tracks.
+    async with transaction():
+        await save_new_artists(plays)
+        await save_new_tracks(plays)
+        await save_played_tracks(plays)
+        await UserToken.objects.bulk_update(
+            tokens,
+            columns=[
+                'played_after',
+                'last_poll_plays',
+                'polled_at',
+                'heavy_listener',
+                'low_rate_polls',
+                'access_token',
+                'expires_at',
+            ],
+        )
+
 
-    Gets `users.access_token` to fetch new user tracks.
+async def get_played_tracks(heavy_listeners_only: bool = False):
+    """
+    Fetches users played tracks since their last fetch, adds new artists and new tracks.
+
+    Gets `users.access_token` to fetch new user tracks, at most
+    `MAX_CONCURRENT_USERS` users at a time. Users whose fetch fails are
+    logged and skipped.
+    Each user is fetched from `user_tokens.played_after`, the last saved play,
+    or from the last day if the user was never fetched.
+    Tokens rejected by spotify are refreshed during the fetch.
+    Fetched plays are saved in batches of `PIPELINE_BATCH_SIZE` while the next
+    users are fetched, at most `PIPELINE_QUEUE_SIZE` users wait to be saved.
+    Batches whose save fails are logged and skipped, their users are fetched
+    again from the same cursor on the next run.
     Filters tracks and artists not on the database to add to `tracks` and `artists`.
     Adds all new played tracks to `played_tracks`.
+    Moves the users `played_after` forward once their tracks are saved.
+
+    Parameters
+    ----------
+    heavy_listeners_only : bool, optional
+        only fetch heavy listeners, see `update_heavy_listener`, by default False
     """
-    async with db:
-        tokens = await UserToken.objects.all()
+    async with connect():
+        tokens = UserToken.objects.select_related('user')
+        if heavy_listeners_only:
+            tokens = tokens.filter(heavy_listener=True)
+        tokens = await tokens.all()
         today = datetime.datetime.now()
         yesterday = today - datetime.timedelta(days=1)
         yesterday_unix_timestamp = int(yesterday.timestamp()) * 1000
-        all_tracks = []
-        for token in tokens:
-            user_tracks = await get_recently_played(
-                token.access_token, after_timestamp=yesterday_unix_timestamp
-            )
-            for track in user_tracks:
-                track['user_id'] = token.user.id
-                track['artist_id'] = track.get('track').get('artists')[0].get('id')
-                track['track_id'] = track.get('track').get('id')
-            all_tracks.append(user_tracks)
-        all_tracks = sum(all_tracks, [])
 
-    await save_new_artists(all_tracks)
-    await save_new_tracks(all_tracks)
-    await save_played_tracks(all_tracks)
+        queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        producer = asyncio.create_task(
+            fetch_played_tracks(tokens, queue, yesterday_unix_timestamp)
+        )
+        failed_users = 0
+        try:
+            async for batch_tokens, plays in iter_played_tracks_batches(
+                queue, PIPELINE_BATCH_SIZE
+            ):
+                try:
+                    await save_played_tracks_batch(batch_tokens, plays)
+                except Exception as e:
+                    users = [token.user.id for token in batch_tokens]
+                    logger.error(f'failed to save played tracks for users {users}: {e!r}')
+                    failed_users += len(batch_tokens)
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                with suppress(asyncio.CancelledError):
+                    await producer
+        if failed_users:
+            logger.warning(
+                f'played tracks save failed for {failed_users} of {len(tokens)} users'
+            )
+        await bump_generation()
 
 
 async def save_new_artists(all_tracks):
     """
     Saves new user artists.
 
-    Filter artists not on `artists`. Save artists to `artists`.
+    Save artists to `artists`, skipping the ones already saved.
     """
-    async with db:
-        new_artists = [track.get('track').get('artists') for track in all_tracks]
-        new_artists = sum(new_artists, [])
+    async with connect():
+        new_artists = [
+            artist for track in all_tracks for artist in track.get('track').get('artists')
+        ]
         new_artists = select_dict_keys(new_artists, ['id', 'name', 'href', 'uri'])
-
-        existing_artists = await Artist.objects.fields(
-            ['id', 'name', 'href', 'uri']
-        ).all()
-        existing_artists = [artist.id for artist in existing_artists]
-
-        new_artists = [*filter(
-            lambda x: x.get('id') not in existing_artists, new_artists
-        )]
         new_artists = filter_duplicate_dicts_by_key(new_artists, 'id')
-
-        await Artist.objects.bulk_create([
-            Artist(**artist) for artist in new_artists
-        ])
+        await insert_ignore(Artist, new_artists)
 
 
 async def save_new_tracks(all_tracks):
     """
     Saves new tracks.
 
-    Filter tracks not on `tracks`. Extract artists from the tracks.
-    Save tracks to `tracks` and link to artists on `tracks_artists`.
+    Save tracks to `tracks`, skipping the ones already saved.
+    Link only the tracks actually inserted to their artists on `tracks_artists`,
+    artists must be saved first.
     """
-    async with db:
+    async with connect():
         new_tracks = [track.get('track') for track in all_tracks]
-
-        existing_tracks = await Track.objects.fields(
-            ['id', 'name', 'href', 'uri', 'popularity']
-        ).all()
-        existing_tracks = [track.id for track in existing_tracks]
-
-        new_tracks = [*filter(
-            lambda x: x.get('id') not in existing_tracks, new_tracks
-        )]
+        new_tracks = filter_duplicate_dicts_by_key(new_tracks, 'id')
+        inserted_tracks = await insert_ignore(
+            Track,
+            select_dict_keys(new_tracks, ['id', 'name', 'href', 'uri', 'popularity']),
+            returning='id',
+        )
+        inserted_tracks = set(inserted_tracks)
         new_tracks_artists = [
             {'track': track.get('id'), 'artist': artist.get('id')}
-            for track in new_tracks for artist in track.get('artists')
+            for track in new_tracks if track.get('id') in inserted_tracks
+            for artist in track.get('artists')
         ]
-        new_tracks = select_dict_keys(
-            new_tracks,
-            ['id', 'name', 'href', 'uri', 'popularity']
-        )
-        new_tracks = filter_duplicate_dicts_by_key(new_tracks, 'id')
-
-        await Track.objects.bulk_create([
-            Track(**track) for track in new_tracks
-        ])
-        await TrackArtist.objects.bulk_create([
-            TrackArtist(**track_artist) for track_artist in new_tracks_artists
-        ])
+        await insert_ignore(TrackArtist, new_tracks_artists)
 
 
 async def save_played_tracks(all_tracks):
     """
     Saves new user recently played tracks.
 
-    Saves all new played tracks to `played_tracks`.
+    Saves all new played tracks to `played_tracks`, skipping the ones
+    already saved, so overlapping runs and retries don't duplicate plays.
+    Updates their days on `daily_plays` with `update_played_days`.
+    Plays must be normalised by `normalise_played_track`.
     """
-    async with db:
-        played_tracks = select_dict_keys(
+    async with connect():
+        played_tracks = project_dicts(
             all_tracks,
-            ['played_at', 'user_id', 'track_id']
-        )
-        played_tracks = rename_dict_keys(
-            played_tracks,
+            ['played_at', 'user_id', 'track_id'],
             {'user_id': 'user', 'track_id': 'track'}
         )
+        await insert_ignore(PlayedTrack, played_tracks)
+        await update_played_days(played_tracks)
 
-        for track in played_tracks:
-            played_at = track.get('played_at')
-            track['played_at'] = dateutil.parser.parse(played_at).replace(tzinfo=None)
-        await PlayedTrack.objects.bulk_create([
-            PlayedTrack(**track) for track in played_tracks
-        ])
+
+def daily_plays_query(condition: sqlalchemy.sql.ClauseElement) -> Insert:
+    """
+    Builds the query recomputing `daily_plays` from the matching `played_tracks`.
+
+    Parameters
+    ----------
+    condition : sqlalchemy.sql.ClauseElement
+        filter of the `played_tracks` to count, must cover whole days
+
+    Returns
+    -------
+    Insert
+        `INSERT ... SELECT ... ON CONFLICT DO UPDATE` query
+    """
+    played_tracks = PlayedTrack.Meta.table
+    tracks = Track.Meta.table
+    day = sqlalchemy.cast(played_tracks.c.played_at, sqlalchemy.Date)
+    plays = sqlalchemy.select([
+        played_tracks.c.user,
+        day,
+        played_tracks.c.track,
+        func.count(),
+        func.coalesce(func.sum(tracks.c.duration_ms), 0),
+    ]).select_from(
+        played_tracks.join(tracks, tracks.c.id == played_tracks.c.track)
+    ).where(condition).group_by(played_tracks.c.user, day, played_tracks.c.track)
+    query = insert(DailyPlay.Meta.table).from_select(
+        ['user', 'day', 'track', 'plays', 'duration_ms'], plays
+    )
+    return query.on_conflict_do_update(
+        index_elements=['user', 'day', 'track'],
+        set_={
+            'plays': query.excluded.plays,
+            'duration_ms': query.excluded.duration_ms,
+        }
+    )
+
+
+def iter_days_ranges(
+    days: Iterable[datetime.date]
+) -> Iterator[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    Groups days into ranges of consecutive days.
+
+    Parameters
+    ----------
+    days : iterable of date
+        days to group
+
+    Yields
+    ------
+    tuple of datetime
+        start of the first day and start of the day after the last one,
+        as naive utc datetimes
+    """
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + datetime.timedelta(days=1)
+        else:
+            ranges.append([day, day + datetime.timedelta(days=1)])
+    for start, end in ranges:
+        yield (
+            datetime.datetime.combine(start, datetime.time()),
+            datetime.datetime.combine(end, datetime.time()),
+        )
+
+
+async def update_played_days(played_tracks: List[Dict]):
+    """
+    Recomputes the `daily_plays` of the users and days of saved played tracks.
+
+    Runs in the transaction that saves the played tracks, so the rollup is
+    committed with them, whatever days they were played on.
+    The users are locked first, so concurrent updates of an user are
+    serialised and the last one counts the plays of both.
+
+    Parameters
+    ----------
+    played_tracks : list of dict
+        `played_tracks` rows, with `user` and `played_at` as naive utc datetime
+    """
+    users_days = defaultdict(set)
+    for played_track in played_tracks:
+        users_days[played_track.get('user')].add(played_track.get('played_at').date())
+    if not users_days:
+        return
+    users = User.Meta.table
+    played_at = PlayedTrack.Meta.table.c.played_at
+    ranges = [
+        sqlalchemy.and_(
+            PlayedTrack.Meta.table.c.user == user, played_at >= start, played_at < end
+        )
+        for user, days in users_days.items()
+        for start, end in iter_days_ranges(days)
+    ]
+    async with connect():
+        async with transaction():
+            await db.fetch_all(
+                sqlalchemy.select([users.c.id])
+                .where(users.c.id.in_(sorted(users_days)))
+                .order_by(users.c.id)
+                .with_for_update(key_share=True)
+            )
+            for i in range(0, len(ranges), DAILY_PLAYS_RANGES_CHUNK):
+                await db.execute(
+                    daily_plays_query(
+                        sqlalchemy.or_(*ranges[i: i + DAILY_PLAYS_RANGES_CHUNK])
+                    )
+                )
+
+
+async def update_daily_plays_durations(track_ids: List[Text]):
+    """
+    Updates the `daily_plays` durations of tracks whose duration was fetched.
+
+    Tracks are saved without duration, so their plays have no duration until
+    `get_track_info` fetches it.
+
+    Parameters
+    ----------
+    track_ids : list of str
+        ids of the tracks
+    """
+    tracks = Track.Meta.table
+    daily_plays = DailyPlay.Meta.table
+    async with connect():
+        for i in range(0, len(track_ids), DAILY_PLAYS_TRACKS_CHUNK):
+            await db.execute(
+                daily_plays.update()
+                .values(duration_ms=daily_plays.c.plays * tracks.c.duration_ms)
+                .where(sqlalchemy.and_(
+                    tracks.c.id == daily_plays.c.track,
+                    daily_plays.c.track.in_(track_ids[i: i + DAILY_PLAYS_TRACKS_CHUNK]),
+                ))
+            )
+
+
+async def update_imported_tracks():
+    """
+    Fetches information for tracks saved without artists.
+
+    Gets tracks from `tracks` not linked on `tracks_artists`, as the ones
+    added by the streaming history importer.
+    Updates the tracks information, saves their artists to `artists` and links
+    them on `tracks_artists`. The artists information is fetched by
+    `get_artist_info`.
+    """
+    tracks = Track.Meta.table
+    tracks_artists = TrackArtist.Meta.table
+    query = sqlalchemy.select([tracks.c.id]).where(
+        ~sqlalchemy.exists().where(tracks_artists.c.track == tracks.c.id)
+    )
+    async with connect():
+        track_ids = [row['id'] for row in await db.fetch_all(query)]
+        if not track_ids:
+            return
+        access_tokens = await UserToken.objects.all()
+        access_tokens = [token.access_token for token in access_tokens]
+
+        tracks_info = await get_tracks(access_tokens, track_ids)
+        tracks_artists = [
+            {'track': track.get('id'), 'artist': artist.get('id')}
+            for track in tracks_info for artist in track.get('artists')
+        ]
+        async with transaction():
+            await save_new_artists([{'track': track} for track in tracks_info])
+            await insert_ignore(TrackArtist, tracks_artists)
+            await Track.objects.bulk_update(
+                [
+                    Track(**select_dict_keys(
+                        track, ['id', 'name', 'href', 'uri', 'popularity']
+                    ))
+                    for track in tracks_info
+                ],
+                columns=['name', 'href', 'uri', 'popularity'],
+            )
+        logger.info(f'updated {len(tracks_info)} of {len(track_ids)} imported tracks')
 
 
 async def get_track_info():
     """
     Fetches information for new tracks.
 
+    Updates tracks saved without artists with `update_imported_tracks`.
     Gets tracks from `tracks` without audio features.
-    Updates tracks with audio features.
+    Updates tracks with audio features, and the durations of their plays on
+    `daily_plays`.
     """
-    async with db:
+    await update_imported_tracks()
+    async with connect():
         new_tracks = await Track.objects.all(duration_ms=None)
         new_tracks_id = [track.id for track in new_tracks]
 
@@ -190,12 +678,18 @@ async def get_track_info():
             ['id'] + columns
         )
 
-        new_tracks.sort(key=lambda x: x.id)
-        audio_features.sort(key=lambda x: x.get('id'))
-        await Track.objects.bulk_update(
-            [track.update_from_dict(features)
-             for track, features in zip(new_tracks, audio_features)]
-        )
+        audio_features = {features.get('id'): features for features in audio_features}
+        updated_tracks = [
+            track.update_from_dict(audio_features[track.id])
+            for track in new_tracks if track.id in audio_features
+        ]
+        if updated_tracks:
+            async with transaction():
+                await Track.objects.bulk_update(updated_tracks)
+                await update_daily_plays_durations(
+                    [track.id for track in updated_tracks]
+                )
+        await bump_generation()
 
 
 async def get_artist_info():
@@ -207,7 +701,7 @@ async def get_artist_info():
     Updates artists with information.
     Link artists to genres on `genres`.
     """
-    async with db:
+    async with connect():
         new_artists = await Artist.objects.all(popularity=None)
         new_artists_id = [artist.id for artist in new_artists]
 
@@ -222,12 +716,12 @@ async def get_artist_info():
             for genre in artist_genres:
                 genres.append({'genre': genre, 'artist': artist.get('id')})
 
-        new_artists.sort(key=lambda x: x.id)
-        artists_info.sort(key=lambda x: x.get('id'))
+        artists_info = {info.get('id'): info for info in artists_info}
         await Artist.objects.bulk_update(
-            [artist.update_from_dict(info)
-             for artist, info in zip(new_artists, artists_info)]
+            [artist.update_from_dict(artists_info[artist.id])
+             for artist in new_artists if artist.id in artists_info]
         )
         await Genre.objects.bulk_create([
             Genre(**genre) for genre in genres
         ])
+        await bump_generation()
@@ -1 +1,10 @@
-from . import data, logger, mem, misc, notify
+import importlib
+
+SUBMODULES = ('cache', 'data', 'logger', 'mem', 'misc', 'notify', 'ratelimit')
+
+
+def __getattr__(name):
+    """Imports submodules on first access, so `mem` and `notify` load only if used."""
+    if name in SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
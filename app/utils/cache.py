@@ -0,0 +1,152 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Text
+
+
+class TTLCache:
+    """
+    Least recently used cache with expiring entries.
+
+    Attributes
+    ----------
+        maxsize: int
+            maximum number of entries, the least recently used are evicted
+        ttl: float
+            seconds an entry is valid for
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        """Number of entries, including the expired ones not yet removed."""
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Gets the value of `key`, or `default` if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Sets the value of `key`, valid for `ttl` seconds, by default `self.ttl`."""
+        if ttl is None:
+            ttl = self.ttl
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Removes `key` from the cache."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Removes all entries."""
+        self._data.clear()
+
+
+class MemoryCache:
+    """
+    In process cache backend.
+
+    Attributes
+    ----------
+        maxsize: int
+            maximum number of entries
+        ttl: float
+            default seconds an entry is valid for
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, key: Text) -> Any:
+        """Gets the value of `key`, None if missing."""
+        return self._cache.get(key)
+
+    async def set(self, key: Text, value: Any, ttl: Optional[float] = None):
+        """Sets the value of `key`."""
+        self._cache.set(key, value, ttl)
+
+
+class RedisCache:
+    """
+    Redis cache backend, values are stored as json.
+
+    Needs the `redis` package. Any client with the `get` and `set` coroutines
+    of `redis.asyncio.Redis` can be passed instead of an url.
+
+    Attributes
+    ----------
+        client: redis.asyncio.Redis
+            redis client
+        ttl: float
+            default seconds an entry is valid for
+        prefix: str
+            prefix of the keys
+    """
+
+    def __init__(
+        self,
+        url: Optional[Text] = None,
+        ttl: float = 300,
+        prefix: Text = 'spotify-tracker:',
+        client: Any = None,
+    ):
+        if client is None:
+            try:
+                from redis.asyncio import Redis
+            except ImportError:
+                raise ImportError('RedisCache needs the redis package. pip install redis')
+            client = Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: Text) -> Any:
+        """Gets the value of `key`, None if missing."""
+        value = await self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    async def set(self, key: Text, value: Any, ttl: Optional[float] = None):
+        """Sets the value of `key`."""
+        if ttl is None:
+            ttl = self.ttl
+        await self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+
+
+def get_cache(
+    url: Optional[Text] = None, maxsize: int = 1024, ttl: float = 300
+):
+    """
+    Creates the cache backend for `url`.
+
+    Parameters
+    ----------
+    url : str, optional
+        redis url, by default None for an in process cache
+    maxsize : int, optional
+        maximum number of entries of the in process cache, by default 1024
+    ttl : float, optional
+        default seconds an entry is valid for, by default 300
+
+    Returns
+    -------
+    MemoryCache or RedisCache
+        cache backend
+    """
+    if url:
+        return RedisCache(url, ttl=ttl)
+    return MemoryCache(maxsize, ttl)
@@ -1,4 +1,22 @@
-from typing import Any, Dict, List, Text, Union
+import itertools
+import json
+import operator
+import re
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Text,
+    TextIO,
+    Union,
+)
+
+JSON_DELIMITER = re.compile(r'[\s,\]]')
 
 
 def select_dict_keys(
@@ -52,27 +70,254 @@ def rename_dict_keys(
         return dictionary
 
 
+def iter_select_dict_keys(
+    dictionaries: Iterable[Dict], keys: List[Text]
+) -> Iterator[Dict]:
+    """
+    Yields subsets of the dictionaries.
+
+    Parameters
+    ----------
+    dictionaries : iterable of dict
+        dictionaries to filter keys
+    keys : list of str
+        keys to select
+
+    Yields
+    ------
+    dict
+        dictionary with subset of keys
+    """
+    for d in dictionaries:
+        yield {k: d.get(k) for k in keys}
+
+
+def iter_rename_dict_keys(
+    dictionaries: Iterable[Dict], keys: Dict
+) -> Iterator[Dict]:
+    """
+    Yields copies of the dictionaries with renamed keys.
+
+    Parameters
+    ----------
+    dictionaries : iterable of dict
+        dictionaries to rename keys
+    keys : dict
+        mapping of old to new key names
+
+    Yields
+    ------
+    dict
+        dictionary with renamed keys
+    """
+    for d in dictionaries:
+        yield rename_dict_keys(d, keys)
+
+
+def iter_project_dicts(
+    dictionaries: Iterable[Dict], keys: List[Text], rename: Optional[Dict] = None
+) -> Iterator[Dict]:
+    """
+    Yields subsets of the dictionaries with renamed keys, in a single pass.
+
+    Parameters
+    ----------
+    dictionaries : iterable of dict
+        dictionaries to project
+    keys : list of str
+        keys to select
+    rename : dict, optional
+        mapping of old to new key names, by default {}
+
+    Yields
+    ------
+    dict
+        dictionary with subset of renamed keys
+    """
+    if rename is None:
+        rename = {}
+    names = [(k, rename.get(k, k)) for k in keys]
+    for d in dictionaries:
+        yield {new: d.get(old) for old, new in names}
+
+
+def project_dicts(
+    dictionaries: Iterable[Dict], keys: List[Text], rename: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Returns subsets of the dictionaries with renamed keys, in a single pass.
+
+    Parameters
+    ----------
+    dictionaries : iterable of dict
+        dictionaries to project
+    keys : list of str
+        keys to select
+    rename : dict, optional
+        mapping of old to new key names, by default {}
+
+    Returns
+    -------
+    list of dict
+        dictionaries with subset of renamed keys
+    """
+    return [*iter_project_dicts(dictionaries, keys, rename)]
+
+
+def iter_unique(
+    iterable: Iterable[Any],
+    key: Union[Hashable, Callable[[Any], Hashable]],
+    keep: Optional[Text] = 'first'
+) -> Iterator[Any]:
+    """
+    Yields the items of `iterable` with unique keys.
+
+    Parameters
+    ----------
+    iterable : iterable
+        items to filter, usually dictionaries
+    key : hashable or callable
+        dictionary key, or function returning the key of an item
+    keep : {'first', 'last'}, optional
+        which of the duplicates to keep, by default 'first'.
+        'last' keeps the position of the first occurrence and needs all the
+        unique items in memory before yielding.
+
+    Yields
+    ------
+    any
+        items with unique keys
+    """
+    if not callable(key):
+        key = operator.itemgetter(key)
+    if keep == 'first':
+        seen = set()
+        for item in iterable:
+            k = key(item)
+            if k not in seen:
+                seen.add(k)
+                yield item
+    elif keep == 'last':
+        unique = {}
+        for item in iterable:
+            unique[key(item)] = item
+        yield from unique.values()
+    else:
+        raise ValueError(f"keep must be 'first' or 'last', got {keep!r}")
+
+
 def filter_duplicate_dicts_by_key(
-    dictionaries: List[Dict], key: Any
+    dictionaries: Iterable[Dict],
+    key: Union[Hashable, Callable[[Dict], Hashable]],
+    keep: Optional[Text] = 'first'
 ) -> List[Dict]:
     """
     Removes duplicate dictionary entries from list.
 
     Parameters
     ----------
-    dictionaries : list of dict
+    dictionaries : iterable of dict
         list of dictionaries
-    key : any hashable item
-        unique key
+    key : hashable or callable
+        unique key, or function returning the unique key of a dictionary
+    keep : {'first', 'last'}, optional
+        which of the duplicates to keep, by default 'first'
 
     Returns
     -------
     list of dict
         list with removed enries
     """
-    unique_keys = []
-    dictionaries = [
-        (d, unique_keys.append(d[key]))
-        for d in dictionaries if d[key] not in unique_keys
-    ]
-    return [*map(lambda x: x[0], dictionaries)]
+    return [*iter_unique(dictionaries, key, keep)]
+
+
+def iter_batches(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Yields the items of `iterable` in lists of `size` items.
+
+    Parameters
+    ----------
+    iterable : iterable
+        items to batch
+    size : int
+        number of items per batch, the last batch may be smaller
+
+    Yields
+    ------
+    list
+        batch of items
+    """
+    iterator = iter(iterable)
+    batch = list(itertools.islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(iterator, size))
+
+
+def iter_json_array(file: TextIO, chunk_size: Optional[int] = 65536) -> Iterator[Any]:
+    """
+    Yields the items of the json array in `file` without loading the whole file.
+
+    The file is read in chunks of `chunk_size` characters and each item is
+    decoded as soon as it is complete, so memory depends on the size of the
+    items and not on the size of the array. An item is complete once followed
+    by a delimiter, since a number cut by the end of a chunk decodes to a
+    shorter number.
+
+    Parameters
+    ----------
+    file : file object
+        text file containing a json array
+    chunk_size : int, optional
+        number of characters read at a time, by default 65536
+
+    Yields
+    ------
+    any
+        decoded array items
+
+    Raises
+    ------
+    ValueError
+        if the file does not contain a json array or an item is invalid
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = '', 0
+    started = eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError('unexpected end of json array')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError('file does not contain a json array')
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = delimiter = None
+        else:
+            delimiter = JSON_DELIMITER.search(buffer, end)
+            if (delimiter is None and eof and end < len(buffer)) or (
+                delimiter is not None and delimiter.start() > end
+            ):
+                raise ValueError(f'invalid json array item at {buffer[pos:end]!r}')
+        if end is None or (delimiter is None and not eof):
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+        pos = end
@@ -1,4 +1,7 @@
-from typing import Any, Optional, Text
+import asyncio
+import os
+from importlib.util import find_spec
+from typing import Any, Awaitable, Dict, List, Optional, Text
 
 import httpx
 from httpx._types import (
@@ -11,6 +14,111 @@ from httpx._types import (
 )
 
 DEFAULT_TIMEOUT = httpx.Timeout(timeout=10)
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP_MAX_REQUESTS_PER_HOST = int(os.getenv('HTTP_MAX_REQUESTS_PER_HOST', 50))
+HTTP2 = find_spec('h2') is not None
+
+_clients: Dict[Text, httpx.AsyncClient] = {}
+_host_semaphores: Dict[Text, asyncio.Semaphore] = {}
+
+
+def get_client(url: URLTypes) -> httpx.AsyncClient:
+    """
+    Gets the shared client for the host of `url`.
+
+    Clients keep their connections alive between requests and are created
+    on first use. They must be closed with `close_clients`.
+
+    Parameters
+    ----------
+    url : str or httpx.URL
+        url of the request
+
+    Returns
+    -------
+    httpx.AsyncClient
+        pooled client for the url host
+    """
+    host = httpx.URL(url).host
+    client = _clients.get(host)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[host] = client
+    return client
+
+
+async def close_clients():
+    """Closes all shared clients and their connection pools."""
+    _host_semaphores.clear()
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
+
+
+def get_host_semaphore(url: URLTypes) -> asyncio.Semaphore:
+    """
+    Gets the semaphore bounding in flight requests to the host of `url`.
+
+    HTTP/2 multiplexes requests over a single connection, so the pool limits
+    alone do not bound how many requests are sent to a host at once.
+
+    Parameters
+    ----------
+    url : str or httpx.URL
+        url of the request
+
+    Returns
+    -------
+    asyncio.Semaphore
+        semaphore for the url host
+    """
+    host = httpx.URL(url).host
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(HTTP_MAX_REQUESTS_PER_HOST)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+
+async def gather_with_concurrency(
+    n: int, *aws: Awaitable, return_exceptions: Optional[bool] = False
+) -> List[Any]:
+    """
+    Runs the awaitables concurrently, with at most `n` running at once.
+
+    Parameters
+    ----------
+    n : int
+        maximum number of awaitables running at the same time
+    *aws : awaitable
+        awaitables to run
+    return_exceptions : bool, optional
+        return exceptions as results instead of raising, by default False
+
+    Returns
+    -------
+    list
+        results in the same order as `aws`
+    """
+    semaphore = asyncio.Semaphore(n)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *(run(aw) for aw in aws), return_exceptions=return_exceptions
+    )
 
 
 async def async_request(
@@ -25,16 +133,14 @@ async def async_request(
     timeout: Optional[int] = DEFAULT_TIMEOUT
 ):
     """
-    Makes an asynchronous request.
+    Makes an asynchronous request using the shared client for the url host.
 
     DEFAULT_TIMEOUT is 10 secongs.
     """
     if isinstance(timeout, int):
         timeout = httpx.Timeout(timeout=timeout)
-    async with httpx.AsyncClient(
-        cookies=cookies,
-        timeout=timeout
-    ) as client:
+    client = get_client(url)
+    async with get_host_semaphore(url):
         return await client.request(
             method=method,
             url=url,
@@ -42,5 +148,7 @@ async def async_request(
             data=data,
             files=files,
             json=json,
-            headers=headers
+            headers=headers,
+            cookies=cookies,
+            timeout=timeout
         )
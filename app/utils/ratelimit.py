@@ -0,0 +1,240 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, List, Optional, Text
+
+import httpx
+from httpx._types import URLTypes
+
+from app.utils.logger import logger
+from app.utils.misc import async_request
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is made while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    Attributes
+    ----------
+        rate: float
+            tokens added per second
+        capacity: float
+            maximum number of tokens, allows bursts up to this size
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def pause(self, seconds: float):
+        """Blocks every acquire for the next `seconds`."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        while True:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that stops requests after consecutive failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests fail fast with `CircuitOpenError`. Once `reset_timeout` seconds
+    have passed requests are let through again, a success closes the
+    circuit and a failure opens it for another `reset_timeout`.
+
+    Attributes
+    ----------
+        failure_threshold: int
+            consecutive failures needed to open the circuit
+        reset_timeout: float
+            seconds the circuit stays open
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected."""
+        return (
+            self._opened_at is not None
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def before_request(self):
+        """Raises `CircuitOpenError` if the circuit is open."""
+        if self.is_open:
+            raise CircuitOpenError(
+                f'circuit open after {self._failures} consecutive failures'
+            )
+
+    def record_success(self):
+        """Closes the circuit."""
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        """Counts a failure, opening the circuit when over the threshold."""
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+def get_retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Gets the seconds to wait from the `Retry-After` header.
+
+    Parameters
+    ----------
+    response : httpx.Response
+        response to inspect
+
+    Returns
+    -------
+    float, optional
+        seconds to wait, None if the header is missing or invalid
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30) -> float:
+    """
+    Exponential backoff delay with full jitter.
+
+    Parameters
+    ----------
+    attempt : int
+        number of the failed attempt, starting at 0
+    base : float, optional
+        delay of the first attempt, by default 0.5
+    cap : float, optional
+        maximum delay, by default 30
+
+    Returns
+    -------
+    float
+        seconds to wait
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def retry_request(
+    method: Text,
+    url: URLTypes,
+    buckets: Optional[List[TokenBucket]] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    max_retries: Optional[int] = 5,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    Makes an asynchronous request, retrying throttled and failed requests.
+
+    Requests answered with 429 or 5xx, and transport errors, are retried with
+    jittered exponential backoff, waiting at least the `Retry-After` of the
+    response. A 429 pauses all `buckets` for the `Retry-After` duration.
+
+    Parameters
+    ----------
+    method : str
+        http method
+    url : str or httpx.URL
+        request url
+    buckets : list of TokenBucket, optional
+        rate limiters to acquire before every attempt, by default []
+    breaker : CircuitBreaker, optional
+        circuit breaker tracking the request failures, by default None
+    max_retries : int, optional
+        maximum number of retries, by default 5
+    **kwargs
+        extra arguments to `async_request`
+
+    Returns
+    -------
+    httpx.Response
+        successful response
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        if the response is an error after all retries
+    httpx.TransportError
+        if the request fails after all retries
+    CircuitOpenError
+        if the circuit breaker is open
+    """
+    if buckets is None:
+        buckets = []
+    for attempt in range(max_retries + 1):
+        if breaker is not None:
+            breaker.before_request()
+        for bucket in buckets:
+            await bucket.acquire()
+        try:
+            response = await async_request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f'{method} {url} failed with {e!r}. retrying in {delay:.1f}s')
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                if breaker is not None:
+                    breaker.record_success()
+                response.raise_for_status()
+                return response
+            if response.status_code >= 500 and breaker is not None:
+                breaker.record_failure()
+            if attempt == max_retries:
+                response.raise_for_status()
+            retry_after = get_retry_after(response)
+            delay = max(retry_after or 0, backoff_delay(attempt))
+            if response.status_code == 429:
+                for bucket in buckets:
+                    bucket.pause(delay)
+            logger.warning(
+                f'{method} {url} returned {response.status_code}. '
+                f'retrying in {delay:.1f}s'
+            )
+        await asyncio.sleep(delay)
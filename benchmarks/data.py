@@ -0,0 +1,92 @@
+"""
+Benchmarks the dictionary helpers of `app.utils.data` by number of records.
+
+Times the dedup and projection of played tracks like records, half of them
+duplicates, and prints the time per record, which stays flat when the helpers
+scale linearly. The list based dedup they replaced is timed at the smaller
+`--quadratic-sizes`, its time per record grows with the number of records.
+
+    $ python -m benchmarks.data --sizes 10000 100000 1000000
+"""
+import argparse
+import timeit
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Text
+
+from app.utils.data import filter_duplicate_dicts_by_key, iter_project_dicts, iter_unique
+
+KEYS = ['id', 'name', 'href', 'uri', 'popularity']
+RENAME = {'id': 'track_id', 'name': 'track_name'}
+
+
+def list_filter_duplicate_dicts_by_key(dictionaries: List[Dict], key: Any) -> List[Dict]:
+    """Removes duplicate dictionaries keeping the seen keys in a list, as before."""
+    unique_keys = []
+    dictionaries = [
+        (d, unique_keys.append(d[key]))
+        for d in dictionaries if d[key] not in unique_keys
+    ]
+    return [*map(lambda x: x[0], dictionaries)]
+
+
+def make_records(size: int) -> List[Dict]:
+    """Builds `size` track records with `size / 2` distinct ids."""
+    return [
+        {
+            'id': f't{i % (size // 2)}',
+            'name': f'track {i}',
+            'href': '',
+            'uri': '',
+            'popularity': i % 100,
+            'artists': [],
+        }
+        for i in range(size)
+    ]
+
+
+def best_time(func: Callable[[], Any], repeat: int) -> float:
+    """Runs `func` `repeat` times, returns the best time in seconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(args: Optional[List[Text]] = None):
+    """Prints the time and the time per record of each helper by number of records."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--quadratic-sizes', type=int, nargs='+', default=[1000, 10_000]
+    )
+    args = parser.parse_args(args)
+
+    benchmarks = {
+        'filter_duplicate_dicts_by_key': lambda records: filter_duplicate_dicts_by_key(
+            records, 'id'
+        ),
+        'filter keep last': lambda records: filter_duplicate_dicts_by_key(
+            records, 'id', keep='last'
+        ),
+        'iter_unique': lambda records: list(iter_unique(records, 'id')),
+        'iter_project_dicts': lambda records: list(
+            iter_project_dicts(records, KEYS, RENAME)
+        ),
+        'list based dedup (before)': lambda records: list_filter_duplicate_dicts_by_key(
+            records, 'id'
+        ),
+    }
+    print(f'{"helper":<30}{"records":>10}{"ms":>12}{"ns/record":>12}')
+    for name, benchmark in benchmarks.items():
+        sizes = args.quadratic_sizes if name.endswith('(before)') else args.sizes
+        for size in sizes:
+            records = make_records(size)
+            seconds = best_time(partial(benchmark, records), args.repeat)
+            print(
+                f'{name:<30}{size:>10}{seconds * 1000:>12.1f}'
+                f'{seconds / size * 1e9:>12.0f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmarks the played tracks fetch of many users against a mock spotify server.
+
+Starts a local server answering the recently played endpoint after `--latency`
+seconds, points the shared client of api.spotify.com to it and measures the
+throughput of `fetch_played_tracks` by number of users and of concurrent users.
+The global rate limit is raised to `--rate-limit`, with the default spotify
+limit the throughput is bounded by it instead of the fan-out.
+
+    $ python -m benchmarks.fetch --users 100 1000 10000 --concurrency 1 10 50
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+from typing import List, Optional, Text
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.database.schema import User, UserToken
+from app.spotify import api, tasks
+from app.utils import misc
+from app.utils.ratelimit import TokenBucket
+
+API_HOST = 'api.spotify.com'
+
+
+def recently_played_page(plays: int) -> bytes:
+    """Builds a recently played page with `plays` items and no next page."""
+    artist = {'id': 'a1', 'name': 'artist', 'href': '', 'uri': ''}
+    items = [
+        {
+            'played_at': f'2021-06-01T12:{i // 60 % 60:02d}:{i % 60:02d}.000Z',
+            'track': {
+                'id': f't{i}',
+                'name': 'track',
+                'href': '',
+                'uri': '',
+                'popularity': 0,
+                'artists': [artist],
+            },
+        }
+        for i in range(plays)
+    ]
+    return json.dumps({'items': items, 'next': None}).encode()
+
+
+def serve(port: int, latency: float, plays: int):
+    """Runs the mock spotify server."""
+    page = recently_played_page(plays)
+
+    async def recently_played(request):
+        await asyncio.sleep(latency)
+        return Response(page, media_type='application/json')
+
+    app = Starlette(routes=[Route('/v1/me/player/recently-played', recently_played)])
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+class MockTransport(httpx.AsyncHTTPTransport):
+    """Sends the requests to the mock server instead of their host."""
+
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+
+    async def handle_async_request(self, method, url, headers, stream, extensions):
+        """Replaces the scheme, host and port of the request url."""
+        _, _, _, path = url
+        return await super().handle_async_request(
+            method, (b'http', b'127.0.0.1', self.port, path), headers, stream, extensions
+        )
+
+
+def free_port() -> int:
+    """Gets a free local port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port: int, timeout: float = 10):
+    """Waits until the mock server accepts connections."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+async def fetch(users: int, port: int) -> float:
+    """Fetches `users` users from the mock server, returns the elapsed seconds."""
+    misc._clients[API_HOST] = httpx.AsyncClient(
+        transport=MockTransport(
+            port,
+            limits=httpx.Limits(
+                max_connections=misc.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=misc.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        ),
+        timeout=misc.DEFAULT_TIMEOUT,
+    )
+    tokens = [
+        UserToken(
+            user=User(id=f'u{i}', email=f'u{i}', hashed_password='', scopes=''),
+            access_token=f'token-u{i}',
+        )
+        for i in range(users)
+    ]
+    queue = asyncio.Queue(maxsize=tasks.PIPELINE_QUEUE_SIZE)
+    started = time.perf_counter()
+    producer = asyncio.create_task(tasks.fetch_played_tracks(tokens, queue, 0))
+    fetched = 0
+    async for batch_tokens, _ in tasks.iter_played_tracks_batches(
+        queue, tasks.PIPELINE_BATCH_SIZE
+    ):
+        fetched += len(batch_tokens)
+    await producer
+    elapsed = time.perf_counter() - started
+    await misc.close_clients()
+    api._token_buckets.clear()
+    if fetched != users:
+        raise RuntimeError(f'fetched {fetched} of {users} users')
+    return elapsed
+
+
+def main(args: Optional[List[Text]] = None):
+    """Prints the fetch throughput by number of users and concurrent users."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds')
+    parser.add_argument('--plays', type=int, default=20, help='plays per user')
+    parser.add_argument('--rate-limit', type=float, default=1e6, help='requests/s')
+    parser.add_argument(
+        '--max-seconds',
+        type=float,
+        default=120,
+        help='skip runs expected to take longer, from the latency',
+    )
+    args = parser.parse_args(args)
+
+    port = free_port()
+    server = multiprocessing.Process(
+        target=serve, args=(port, args.latency, args.plays), daemon=True
+    )
+    server.start()
+    try:
+        wait_for_server(port)
+        api._global_bucket = TokenBucket(args.rate_limit)
+        print(f'{"users":>8}{"concurrency":>13}{"seconds":>10}{"users/s":>10}')
+        for users in args.users:
+            for concurrency in args.concurrency:
+                if users / concurrency * args.latency > args.max_seconds:
+                    print(f'{users:>8}{concurrency:>13}{"skipped":>10}')
+                    continue
+                tasks.MAX_CONCURRENT_USERS = concurrency
+                elapsed = asyncio.run(fetch(users, port))
+                print(
+                    f'{users:>8}{concurrency:>13}{elapsed:>10.2f}'
+                    f'{users / elapsed:>10.0f}'
+                )
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
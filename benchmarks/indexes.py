@@ -0,0 +1,218 @@
+"""
+Benchmarks the /user/* queries without and with the lookup indexes.
+
+Seeds a synthetic dataset on the database of the `APP_DB_*` variables, then
+runs `EXPLAIN ANALYZE` of every query shape of the /user/* endpoints, first
+without the indexes of the `b7a3e15f9c08` migration and then with them.
+Tables are dropped and created again, only run it against a scratch database.
+
+    $ APP_DB_DATABASE=spotify_bench python -m benchmarks.indexes --plays 10000000
+"""
+import argparse
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Text, Tuple
+
+import sqlalchemy
+
+from app.api.crud.played_tracks import (
+    artists_query,
+    encode_cursor,
+    genres_query,
+    played_tracks_query,
+    tracks_query,
+)
+from app.database.schema import db, metadata
+
+INDEXES = [
+    index.name
+    for table in metadata.sorted_tables
+    for index in table.indexes
+    if index.name.startswith('ix_')
+]
+END = datetime(2021, 6, 1)
+DAYS = 730
+
+SEED = [
+    '''
+    INSERT INTO users (id, email, hashed_password, scopes)
+    SELECT 'u' || i, 'u' || i || '@mail.com', '', 'user'
+    FROM generate_series(1, :users) i
+    ''',
+    '''
+    INSERT INTO artists (id, name, href, uri, popularity)
+    SELECT 'a' || i, 'artist ' || i, '', '', i % 100
+    FROM generate_series(1, :artists) i
+    ''',
+    '''
+    INSERT INTO genres (artist, genre)
+    SELECT 'a' || i, 'genre ' || ((i * g) % 500)
+    FROM generate_series(1, :artists) i, generate_series(1, 2) g
+    ''',
+    '''
+    INSERT INTO tracks (id, name, href, uri, popularity, duration_ms)
+    SELECT 't' || i, 'track ' || i, '', '', i % 100, 200000
+    FROM generate_series(1, :tracks) i
+    ''',
+    '''
+    INSERT INTO trackartists (track, artist)
+    SELECT 't' || i, 'a' || (1 + (i * a) % :artists)
+    FROM generate_series(1, :tracks) i, generate_series(1, 2) a
+    WHERE a = 1 OR i % 3 = 0
+    ''',
+    # users play at different rates, so some have many more plays than others
+    '''
+    INSERT INTO playedtracks ("user", track, played_at)
+    SELECT
+        'u' || (1 + floor(:users * power(random(), 2))::int),
+        't' || (1 + floor(:tracks * power(random(), 3))::int),
+        :end - random() * (:days * interval '1 day')
+    FROM generate_series(1, :plays)
+    ON CONFLICT DO NOTHING
+    ''',
+    '''
+    INSERT INTO dailyplays ("user", day, track, plays, duration_ms)
+    SELECT "user", played_at::date, track, count(*), count(*) * 200000
+    FROM playedtracks
+    GROUP BY "user", played_at::date, track
+    ''',
+]
+
+
+def drop_indexes(engine: sqlalchemy.engine.Engine):
+    """Drops the lookup indexes."""
+    with engine.begin() as connection:
+        for name in INDEXES:
+            connection.execute(sqlalchemy.text(f'DROP INDEX IF EXISTS {name}'))
+
+
+def seed(engine: sqlalchemy.engine.Engine, plays: int, users: int):
+    """Creates the tables and fills them with about `plays` plays of `users` users."""
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    drop_indexes(engine)
+    params = {
+        'plays': plays,
+        'users': users,
+        'tracks': max(plays // 200, 100),
+        'artists': max(plays // 1000, 20),
+        'days': DAYS,
+        'end': END,
+    }
+    with engine.begin() as connection:
+        for statement in SEED:
+            connection.execute(sqlalchemy.text(statement), params)
+
+
+def query_shapes(
+    engine: sqlalchemy.engine.Engine
+) -> List[Tuple[Text, sqlalchemy.sql.Select]]:
+    """Builds the /user/* queries of the user with the median number of plays."""
+    with engine.connect() as connection:
+        user_id, count = connection.execute(sqlalchemy.text(
+            '''
+            SELECT "user", count(*) FROM playedtracks
+            GROUP BY "user" ORDER BY count(*) LIMIT 1
+            OFFSET (SELECT count(DISTINCT "user") / 2 FROM playedtracks)
+            '''
+        )).one()
+        last_month = {
+            'user': user_id,
+            'played_at__gte': END - timedelta(days=30),
+            'played_at__lt': END,
+        }
+        first_page = connection.execute(played_tracks_query(last_month, 50)).all()
+    cursor = encode_cursor(dict(first_page[-1]))
+    days = {'user': user_id, 'day__gte': (END - timedelta(days=30)).date()}
+    print(f'user {user_id} with {count} plays')
+    return [
+        ('/played-tracks month page', played_tracks_query(last_month, limit=50)),
+        ('/played-tracks next page', played_tracks_query(last_month, 50, cursor)),
+        ('/played-tracks all', played_tracks_query({'user': user_id})),
+        ('/tracks month', tracks_query(days, limit=50)),
+        ('/artists month', artists_query(days, limit=50)),
+        ('/genres month', genres_query(days, limit=50)),
+        ('/tracks all', tracks_query({'user': user_id}, limit=50)),
+        ('/genres all', genres_query({'user': user_id}, limit=50)),
+    ]
+
+
+def explain(
+    engine: sqlalchemy.engine.Engine, query: sqlalchemy.sql.Select, runs: int
+) -> Tuple[float, Text]:
+    """Runs `EXPLAIN ANALYZE` of `query`, returns the best execution time and plan."""
+    compiled = query.compile(engine)
+    best, plan = float('inf'), ''
+    with engine.connect() as connection:
+        for _ in range(runs):
+            rows = connection.exec_driver_sql(
+                f'EXPLAIN (ANALYZE, BUFFERS) {compiled}', compiled.params
+            ).scalars().all()
+            plan = '\n'.join(rows)
+            ms = float(re.search(r'Execution Time: ([\d.]+) ms', plan).group(1))
+            best = min(best, ms)
+    return best, plan
+
+
+def run(
+    engine: sqlalchemy.engine.Engine,
+    shapes: List[Tuple[Text, sqlalchemy.sql.Select]],
+    runs: int,
+    verbose: bool,
+) -> Dict[Text, Tuple[float, List[Text]]]:
+    """Explains every query shape, returns its time and the indexes it reads."""
+    results = {}
+    for name, query in shapes:
+        ms, plan = explain(engine, query, runs)
+        used = sorted(set(re.findall(r'(?:using|Index Scan on) (\w+)', plan)))
+        results[name] = (ms, used)
+        if verbose:
+            print(f'-- {name}\n{plan}\n')
+    return results
+
+
+def main(args: Optional[List[Text]] = None):
+    """Seeds the database and prints the query times without and with indexes."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--plays', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=5, help='runs of each query')
+    parser.add_argument('--no-seed', dest='seed', action='store_false')
+    parser.add_argument('--verbose', action='store_true', help='print the plans')
+    args = parser.parse_args(args)
+
+    engine = sqlalchemy.create_engine(
+        str(db.url.replace(dialect='postgresql', driver=''))
+    )
+    if args.seed:
+        started = time.perf_counter()
+        seed(engine, args.plays, args.users)
+        print(f'seeded in {time.perf_counter() - started:.0f}s')
+
+    drop_indexes(engine)
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text('ANALYZE'))
+    shapes = query_shapes(engine)
+    before = run(engine, shapes, args.runs, args.verbose)
+
+    started = time.perf_counter()
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text('ANALYZE'))
+    print(f'indexed in {time.perf_counter() - started:.0f}s')
+    after = run(engine, shapes, args.runs, args.verbose)
+
+    print(f'{"query":<28}{"before ms":>12}{"after ms":>12}')
+    for name, (before_ms, before_used) in before.items():
+        after_ms, after_used = after[name]
+        print(f'{name:<28}{before_ms:>12.2f}{after_ms:>12.2f}')
+        print(f'    before: {", ".join(before_used) or "no index"}')
+        print(f'    after:  {", ".join(after_used) or "no index"}')
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmarks how concurrent /token requests affect the latency of other endpoints.
+
+Sends `--concurrency` /token requests at a time for `--seconds` while probing
+`GET /` every `--interval` seconds, in the same event loop as the api, first
+hashing on the event loop as before and then on the password thread pool.
+Creates the tables if missing and a benchmark user on the database of the
+`APP_DB_*` variables, only run it against a scratch database.
+
+    $ APP_DB_DATABASE=spotify_bench python -m benchmarks.token --concurrency 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List, Optional, Text
+
+import httpx
+import sqlalchemy
+
+from app.api.dependencies import security
+from app.api.dependencies.config import SETTINGS
+from app.api.main import app
+from app.database.schema import User, db, metadata
+
+EMAIL = 'benchmark@mail.com'
+PASSWORD = 'benchmark'
+
+
+async def create_user():
+    """Creates the benchmark user, with a hash of the current work factor."""
+    engine = sqlalchemy.create_engine(
+        str(db.url.replace(dialect='postgresql', driver=''))
+    )
+    metadata.create_all(engine)
+    engine.dispose()
+    async with db:
+        await User.objects.filter(email=EMAIL).delete()
+        await User.objects.create(
+            id='benchmark',
+            email=EMAIL,
+            hashed_password=await security.get_password_hash(PASSWORD),
+            scopes='user',
+        )
+
+
+async def load(concurrency: int, seconds: float, interval: float) -> Dict[Text, float]:
+    """Sends /token requests while probing `GET /`, returns the latencies."""
+    probes: List[float] = []
+    tokens = 0
+    deadline = time.perf_counter() + seconds
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        await client.get('/')
+
+        async def login():
+            nonlocal tokens
+            while time.perf_counter() < deadline:
+                response = await client.post(
+                    '/token', data={'username': EMAIL, 'password': PASSWORD}
+                )
+                response.raise_for_status()
+                tokens += 1
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get('/')).raise_for_status()
+                probes.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(interval)
+
+        await asyncio.gather(probe(), *(login() for _ in range(concurrency)))
+    await db.disconnect()
+    probes.sort()
+    return {
+        'tokens/s': tokens / seconds,
+        'p50 ms': statistics.median(probes),
+        'p99 ms': probes[int(len(probes) * 0.99)],
+        'max ms': probes[-1],
+    }
+
+
+async def run_on_event_loop(func, *args):
+    """Runs the password hashing function on the event loop, as before."""
+    return func(*args)
+
+
+def main(args: Optional[List[Text]] = None):
+    """Prints the `GET /` latency under /token load, on the event loop and off it."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--interval', type=float, default=0.01, help='seconds')
+    args = parser.parse_args(args)
+
+    SETTINGS.secret_key = SETTINGS.secret_key or 'benchmark'
+    SETTINGS.algorithm = SETTINGS.algorithm or 'HS256'
+    SETTINGS.access_token_expire_minutes = SETTINGS.access_token_expire_minutes or 5
+    asyncio.run(create_user())
+    print(
+        f'bcrypt rounds {SETTINGS.bcrypt_rounds}, '
+        f'{SETTINGS.password_hash_workers} hashing threads'
+    )
+
+    run_in_pwd_executor = security.run_in_pwd_executor
+    results = {}
+    for name, runner in [
+        ('event loop', run_on_event_loop),
+        ('thread pool', run_in_pwd_executor),
+    ]:
+        security.run_in_pwd_executor = runner
+        results[name] = asyncio.run(load(args.concurrency, args.seconds, args.interval))
+    security.run_in_pwd_executor = run_in_pwd_executor
+
+    columns = list(results['thread pool'])
+    print(f'{"hashing on":<14}' + ''.join(f'{column:>12}' for column in columns))
+    for name, result in results.items():
+        print(f'{name:<14}' + ''.join(f'{result[column]:>12.1f}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,59 @@
 import asyncio
 import os
 from datetime import timedelta
+from functools import partial
 
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.utils.dates import days_ago
 
+from app.database.db import connect
 from app.spotify.tasks import (
     get_artist_info,
     get_played_tracks,
     get_track_info,
     update_access_tokens,
 )
+from app.utils.misc import close_clients
+
+
+async def run_task(task):
+    """Runs the task on a single database pool and closes the shared http clients."""
+    try:
+        async with connect():
+            await task()
+    finally:
+        await close_clients()
 
 
 def run_update_access_tokens():
     """Run update_access_tokens."""
-    asyncio.run(update_access_tokens())
+    asyncio.run(run_task(update_access_tokens))
+
+
+def run_update_heavy_listeners_access_tokens():
+    """Run update_access_tokens for heavy listeners."""
+    asyncio.run(run_task(partial(update_access_tokens, heavy_listeners_only=True)))
 
 
 def run_get_played_tracks():
     """Run get_played_tracks."""
-    asyncio.run(get_played_tracks())
+    asyncio.run(run_task(get_played_tracks))
+
+
+def run_get_heavy_listeners_played_tracks():
+    """Run get_played_tracks for heavy listeners."""
+    asyncio.run(run_task(partial(get_played_tracks, heavy_listeners_only=True)))
 
 
 def run_get_track_info():
     """Run get_track_info."""
-    asyncio.run(get_track_info())
+    asyncio.run(run_task(get_track_info))
 
 
 def run_get_artist_info():
     """Run get_artist_info."""
-    asyncio.run(get_artist_info())
+    asyncio.run(run_task(get_artist_info))
 
 
 default_args = {
@@ -76,3 +98,26 @@ t4 = PythonOperator(
 )
 
 t1 >> t2 >> [t3, t4]
+
+heavy_listeners_dag = DAG(
+    'spotify_etl_heavy_listeners',
+    default_args=default_args,
+    description='DAG to fetch heavy listeners played tracks more often',
+    schedule_interval=timedelta(hours=1),
+    start_date=days_ago(1),
+    catchup=False,
+    tags=['spotify'],
+)
+
+h1 = PythonOperator(
+    task_id='update_access_tokens',
+    python_callable=run_update_heavy_listeners_access_tokens,
+    dag=heavy_listeners_dag
+)
+h2 = PythonOperator(
+    task_id='get_played_tracks',
+    python_callable=run_get_heavy_listeners_played_tracks,
+    dag=heavy_listeners_dag
+)
+
+h1 >> h2
@@ -52,18 +52,26 @@ def get_artists(token):
 
 def get_audio_features(token):
     response = requests.get(
-        'http://localhost:8000/user/audio-features',
+        'http://localhost:8000/user/audio-features/summary',
         headers={
             'Content-Type': 'accept: application/json',
             'Authorization': f'Bearer {token}'
         }
     )
     audio_features = response.json()
-    audio_features = pd.DataFrame(audio_features)
-    return [alt.Chart(audio_features).mark_bar().encode(
-        alt.X(feature, bin=True),
-        y='count()',
-    ) for feature in audio_features.columns]
+    charts = []
+    for feature, summary in audio_features.items():
+        histogram = pd.DataFrame({
+            'start': summary['bins'][:-1],
+            'end': summary['bins'][1:],
+            'count': summary['counts'],
+        })
+        charts.append(alt.Chart(histogram).mark_bar().encode(
+            alt.X('start', bin='binned', title=feature),
+            alt.X2('end'),
+            y='count',
+        ))
+    return charts
 
 
 def get_genres(token):
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+import sqlalchemy
+
+os.environ.setdefault('APP_DB_CONNECTOR', 'postgresql')
+os.environ.setdefault('APP_DB_USERNAME', 'postgres')
+os.environ.setdefault('APP_DB_PASSWORD', 'postgres')
+os.environ.setdefault('APP_DB_HOST', 'localhost')
+os.environ.setdefault('APP_DB_PORT', '5432')
+os.environ.setdefault('APP_DB_DATABASE', 'spotify_test')
+
+
+@pytest.fixture
+def database():
+    """Creates the tables on the test database, skips if it is not available."""
+    from app.database.schema import db, metadata
+
+    url = db.url.replace(dialect='postgresql', driver='')
+    engine = sqlalchemy.create_engine(str(url))
+    try:
+        engine.connect().close()
+    except sqlalchemy.exc.OperationalError:
+        pytest.skip('test database not available')
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    try:
+        yield db
+    finally:
+        metadata.drop_all(engine)
+        engine.dispose()
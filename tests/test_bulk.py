@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.database import bulk
+from app.database.db import connect, transaction
+from app.database.schema import Artist, PlayedTrack, Track, TrackArtist, User
+
+
+def make_tracks(ids):
+    """Builds tracks rows."""
+    return [
+        {'id': f't{i}', 'name': f'track {i}', 'href': '', 'uri': '', 'popularity': i}
+        for i in ids
+    ]
+
+
+def test_copy_ignore(database):
+    """Copied rows skip the existing ones and return only the inserted ones."""
+    async def run():
+        async with connect():
+            first = await bulk.copy_ignore(Track, make_tracks(range(3)), returning='id')
+            second = await bulk.copy_ignore(
+                Track, make_tracks(range(1, 5)), returning='id'
+            )
+            none = await bulk.copy_ignore(Track, make_tracks(range(5)))
+            tracks = await Track.objects.order_by('id').all()
+            return first, second, none, tracks
+
+    first, second, none, tracks = asyncio.run(run())
+    assert sorted(first) == ['t0', 't1', 't2']
+    assert sorted(second) == ['t3', 't4']
+    assert none == []
+    assert [(track.id, track.popularity) for track in tracks] == [
+        (f't{i}', i) for i in range(5)
+    ]
+
+
+def test_copy_ignore_in_transaction(database):
+    """Copies share the outer transaction and are rolled back with it."""
+    async def run():
+        async with connect():
+            await User.objects.create(
+                id='u1', email='u1@mail.com', hashed_password='', scopes=''
+            )
+            await bulk.copy_ignore(Track, make_tracks([0]))
+            played_tracks = [
+                {'user': 'u1', 'track': 't0', 'played_at': datetime(2021, 6, 1, i)}
+                for i in range(3)
+            ]
+            with pytest.raises(RuntimeError):
+                async with transaction():
+                    await bulk.copy_ignore(PlayedTrack, played_tracks[:2])
+                    await bulk.copy_ignore(PlayedTrack, played_tracks)
+                    assert await PlayedTrack.objects.count() == 3
+                    raise RuntimeError()
+            return await PlayedTrack.objects.count()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_insert_ignore_uses_copy(database, monkeypatch):
+    """Batches of at least COPY_MIN_ROWS rows are copied, with the same result."""
+    monkeypatch.setattr(bulk, 'COPY_MIN_ROWS', 10)
+    copies = []
+    copy_ignore = bulk.copy_ignore
+
+    async def count_copy_ignore(*args, **kwargs):
+        copies.append(args)
+        return await copy_ignore(*args, **kwargs)
+
+    monkeypatch.setattr(bulk, 'copy_ignore', count_copy_ignore)
+
+    async def run():
+        async with connect():
+            small = await bulk.insert_ignore(Track, make_tracks(range(5)), returning='id')
+            large = await bulk.insert_ignore(
+                Track, make_tracks(range(20)), chunk_size=3, returning='id'
+            )
+            return small, large, await Track.objects.count()
+
+    small, large, count = asyncio.run(run())
+    assert len(copies) == 1
+    assert sorted(small) == [f't{i}' for i in range(5)]
+    assert sorted(large) == sorted(f't{i}' for i in range(5, 20))
+    assert count == 20
+
+
+def test_insert_ignore_track_artists(database):
+    """A track is linked to an artist once, however many times it is inserted."""
+    async def run():
+        async with connect():
+            await bulk.insert_ignore(Track, make_tracks([0]))
+            await bulk.insert_ignore(
+                Artist, [{'id': 'a0', 'name': 'artist 0', 'href': '', 'uri': ''}]
+            )
+            links = [{'track': 't0', 'artist': 'a0'}]
+            await bulk.insert_ignore(TrackArtist, links)
+            await bulk.insert_ignore(TrackArtist, links * 2)
+            return await TrackArtist.objects.count()
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from app.utils import cache
+from app.utils.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the monotonic clock."""
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_ttl_cache_expires(clock):
+    """Entries are missing once their ttl has passed."""
+    ttl_cache = TTLCache(ttl=10)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2, ttl=20)
+    clock[0] += 9
+    assert ttl_cache.get('a') == 1
+    clock[0] += 1
+    assert ttl_cache.get('a', 'missing') == 'missing'
+    assert ttl_cache.get('b') == 2
+    assert len(ttl_cache) == 1
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    """Getting or setting an entry keeps it over the others."""
+    ttl_cache = TTLCache(maxsize=2)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+    ttl_cache.get('a')
+    ttl_cache.set('c', 3)
+    assert ttl_cache.get('b') is None
+    ttl_cache.set('a', 4)
+    ttl_cache.set('d', 5)
+    assert [ttl_cache.get(key) for key in 'acd'] == [4, None, 5]
+    ttl_cache.delete('a')
+    assert len(ttl_cache) == 1
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from app.utils.data import iter_json_array, iter_unique
+
+ARRAYS = [
+    '[]',
+    '[12.5, 3]',
+    '[1.5]',
+    '[true, 1e5, null, -0.5e-3, 12.5E+3]',
+    ' [ {"a": [1, {"b": "]"}]} , "x,]" ]\n',
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 8, 65536])
+@pytest.mark.parametrize('text', ARRAYS)
+def test_iter_json_array(text, chunk_size):
+    """Items are decoded whatever the chunks they are split across."""
+    items = iter_json_array(io.StringIO(text), chunk_size=chunk_size)
+    assert list(items) == json.loads(text)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 65536])
+@pytest.mark.parametrize('text', ['{"a": 1}', '[1, 2', '[1x, 2]', '[12.5x]', '[tru]'])
+def test_iter_json_array_invalid(text, chunk_size):
+    """Files that are not a json array raise ValueError."""
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize(
+    'keep, expected', [('first', ['a1', 'b', 'c']), ('last', ['a2', 'b', 'c'])]
+)
+def test_iter_unique(keep, expected):
+    """Duplicates keep the position of the first occurrence."""
+    items = [
+        {'id': 1, 'v': 'a1'},
+        {'id': 2, 'v': 'b'},
+        {'id': 1, 'v': 'a2'},
+        {'id': 3, 'v': 'c'},
+    ]
+    assert [item['v'] for item in iter_unique(items, 'id', keep)] == expected
+    by_parity = iter_unique(iter(range(6)), lambda n: n % 2, keep)
+    assert list(by_parity) == ([0, 1] if keep == 'first' else [4, 5])
+
+
+def test_iter_unique_invalid_keep():
+    """Only 'first' and 'last' are valid values of keep."""
+    with pytest.raises(ValueError):
+        list(iter_unique([], 'id', 'none'))
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from datetime import date, datetime
+
+from app.database.db import connect
+from app.database.generations import get_generation
+from app.database.schema import DailyPlay, PlayedTrack, User
+from app.spotify.importer import (
+    import_streaming_history,
+    iter_streaming_history,
+    parse_streaming_record,
+)
+
+
+def make_record(track_id='t1', ts='2021-06-01T12:00:00Z', ms_played=60000, **kwargs):
+    """Builds an extended streaming history record."""
+    return {
+        'ts': ts,
+        'ms_played': ms_played,
+        'master_metadata_track_name': 'track',
+        'spotify_track_uri': f'spotify:track:{track_id}',
+        **kwargs,
+    }
+
+
+def test_parse_streaming_record():
+    """Plays keep the track id and name and the time as naive utc."""
+    assert parse_streaming_record(make_record(ts='2021-06-01T12:00:00-03:00'), 30000) == {
+        'track_id': 't1',
+        'track_name': 'track',
+        'played_at': datetime(2021, 6, 1, 15),
+    }
+
+
+def test_parse_streaming_record_skips():
+    """Records without track, without valid time or too short are skipped."""
+    episode = make_record(spotify_track_uri=None, spotify_episode_uri='spotify:episode:e')
+    assert parse_streaming_record(episode, 30000) is None
+    assert parse_streaming_record(make_record(ms_played=1000), 30000) is None
+    record = make_record()
+    del record['ts']
+    assert parse_streaming_record(record, 30000) is None
+    assert parse_streaming_record(make_record(ts=None), 30000) is None
+    assert parse_streaming_record(make_record(ts='yesterday'), 30000) is None
+
+
+def test_iter_streaming_history(tmp_path):
+    """Skipped records don't stop the import of a file."""
+    path = tmp_path / 'endsong_0.json'
+    records = [make_record('t1'), make_record(ts=None), make_record('t2')]
+    path.write_text(json.dumps(records))
+    plays = iter_streaming_history([str(path)], 30000)
+    assert [play['track_id'] for play in plays] == ['t1', 't2']
+
+
+def test_import_streaming_history(database, tmp_path):
+    """Imported plays are saved once, counted on daily_plays and invalidate the cache."""
+    path = tmp_path / 'endsong_0.json'
+    records = [
+        make_record('t1', '2019-01-01T10:00:00Z'),
+        make_record('t1', '2019-01-01T11:00:00Z'),
+        make_record('t2', '2019-01-02T10:00:00Z'),
+    ]
+    path.write_text(json.dumps(records))
+
+    async def run():
+        async with connect():
+            await User.objects.create(
+                id='u1', email='u1@mail.com', hashed_password='', scopes=''
+            )
+            for _ in range(2):
+                await import_streaming_history(
+                    'u1', [str(path)], batch_size=2, min_ms_played=0, fetch_info=False
+                )
+            daily_plays = await DailyPlay.objects.order_by(['day', 'track']).all()
+            return await PlayedTrack.objects.count(), await get_generation(), [
+                (play.day, play.track.id, play.plays) for play in daily_plays
+            ]
+
+    assert asyncio.run(run()) == (3, 2, [
+        (date(2019, 1, 1), 't1', 2),
+        (date(2019, 1, 2), 't2', 1),
+    ])
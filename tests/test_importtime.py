@@ -0,0 +1,48 @@
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_BUDGET_US = 100000
+HANDLER_BUDGET_US = 1500000
+DEFERRED_MODULES = {'jinja2', 'passlib', 'psutil', 'requests'}
+IMPORT_TIME = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def import_times(code, **env):
+    """Runs `code` with -X importtime, returns the cumulative time of each module."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env={**os.environ, **env},
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is not None:
+            cumulative, indent, module = match.groups()
+            times[module] = (int(cumulative), not indent)
+    return times
+
+
+def total_time(times):
+    """Sums the cumulative time of the top level imports."""
+    return sum(cumulative for cumulative, top_level in times.values() if top_level)
+
+
+def test_import_app_budget():
+    """Importing the package does not import its submodules."""
+    times = import_times('import app')
+    assert times['app'][0] < IMPORT_BUDGET_US
+    assert not {'app.api', 'app.database', 'fastapi', 'sqlalchemy'} & set(times)
+
+
+def test_lambda_handler_budget():
+    """The lambda handler is created without the modules only some routes need."""
+    times = import_times('import app; app.handler', APP_LAMBDA='true')
+    assert 'app.api.main' in times
+    assert not DEFERRED_MODULES & set(times)
+    assert total_time(times) < HANDLER_BUDGET_US
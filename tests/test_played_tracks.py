@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.api.crud.played_tracks import (
+    PERCENTILES,
+    decode_cursor,
+    encode_cursor,
+    get_audio_features_summary,
+)
+from app.database.db import connect
+from app.database.schema import PlayedTrack, Track, User
+
+
+def test_get_audio_features_summary(database):
+    """Statistics, percentiles and histograms count every play of a track."""
+    async def run():
+        async with connect():
+            await User.objects.create(
+                id='u1', email='u1@mail.com', hashed_password='', scopes=''
+            )
+            features = [(0.0, 100, 0.0), (0.5, 100, None), (1.0, None, 1.0)]
+            for i, (energy, tempo, valence) in enumerate(features):
+                await Track.objects.create(
+                    id=f't{i}', name='', href='', uri='', popularity=0,
+                    energy=energy, tempo=tempo, valence=valence,
+                )
+                for day in range(i + 1):
+                    await PlayedTrack.objects.create(
+                        user='u1', track=f't{i}', played_at=datetime(2021, 6, day + 1)
+                    )
+            return await get_audio_features_summary(
+                {'user': 'u1'}, ['energy', 'tempo', 'valence', 'liveness'], bins=4
+            )
+
+    summary = asyncio.run(run())
+    energy = summary['energy']
+    assert energy['count'] == 6
+    assert energy['mean'] == pytest.approx(4 / 6)
+    assert (energy['min'], energy['max']) == (0, 1)
+    assert list(energy['percentiles']) == PERCENTILES
+    assert energy['percentiles'][0.5] == pytest.approx(0.75)
+    assert energy['bins'] == [0, 0.25, 0.5, 0.75, 1]
+    assert energy['counts'] == [1, 0, 2, 3]
+    tempo = summary['tempo']
+    assert tempo['count'] == 3
+    assert (tempo['bins'], tempo['counts']) == ([100, 100], [3])
+    assert summary['valence']['counts'] == [1, 0, 0, 3]
+    assert summary['liveness']['count'] == 0
+    assert summary['liveness']['counts'] == []
+
+
+def test_decode_cursor():
+    """Cursors are decoded back to the played at and id they were encoded from."""
+    played_at = datetime(2021, 6, 1, 12, 30, 15, 500)
+    cursor = encode_cursor({'played_at': played_at, 'id': 42})
+    assert decode_cursor(cursor) == (played_at, 42)
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        '',
+        '42',
+        '2021-06-01T12:00:00',
+        '2021-06-01_x',
+        'x_1',
+        '2021-06-01T12:00:00+03:00_5',
+        '2021-06-01T12:00:00+00:00_5',
+    ],
+)
+def test_decode_cursor_invalid(cursor):
+    """Invalid cursors raise ValueError."""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
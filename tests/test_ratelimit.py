@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.utils import ratelimit
+from app.utils.ratelimit import CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the monotonic clock, sleeping moves it forward."""
+    now = [100.0]
+
+    async def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(ratelimit.asyncio, 'sleep', sleep)
+    return now
+
+
+def test_token_bucket_rate(clock):
+    """A burst up to the capacity is immediate, then tokens arrive at the rate."""
+    async def acquire(bucket, n):
+        times = []
+        for _ in range(n):
+            await bucket.acquire()
+            times.append(clock[0] - 100)
+        return times
+
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert asyncio.run(acquire(bucket, 5)) == [0, 0, 0, 0.5, 1]
+
+
+def test_token_bucket_pause(clock):
+    """A paused bucket waits for the pause to end before taking a token."""
+    bucket = TokenBucket(rate=1)
+    bucket.pause(5)
+    bucket.pause(2)
+    asyncio.run(bucket.acquire())
+    assert clock[0] == 105
+
+
+def test_circuit_breaker(clock):
+    """The circuit opens after consecutive failures, until the reset timeout."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    clock[0] += 10
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.is_open
+    clock[0] += 10
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert not breaker.is_open
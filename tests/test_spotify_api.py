@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.spotify import api
+from app.utils.cache import TTLCache
+
+
+@pytest.fixture
+def token_buckets(monkeypatch):
+    """Records the token rate limits of the requests, answers 401 to `expired`."""
+    buckets = {}
+
+    async def retry_request(method, url, buckets, headers, **kwargs):
+        access_token = headers['Authorization'].split()[-1]
+        if access_token == 'expired':
+            response = httpx.Response(401, request=httpx.Request(method, url))
+            response.raise_for_status()
+        requested[access_token] = buckets[-1]
+
+    requested = {}
+    monkeypatch.setattr(api, 'retry_request', retry_request)
+    monkeypatch.setattr(api, '_token_buckets', TTLCache(maxsize=2, ttl=3600))
+    return requested
+
+
+def test_token_buckets_are_bounded(token_buckets):
+    """Only the most recently used token rate limits are kept."""
+    async def request():
+        for access_token in ('a', 'b', 'a', 'c'):
+            await api.spotify_request('get', 'https://api', access_token=access_token)
+
+    asyncio.run(request())
+    assert len(api._token_buckets) == 2
+    assert api._token_buckets.get('a') is token_buckets['a']
+    assert api._token_buckets.get('b') is None
+
+
+def test_refreshed_token_keeps_rate_limit(token_buckets):
+    """A token refreshed after a 401 takes from the rate limit of the old one."""
+    async def refresh():
+        return 'refreshed'
+
+    async def request():
+        await api.spotify_request(
+            'get', 'https://api', access_token='expired', on_unauthorized=refresh
+        )
+
+    expired_bucket = api.TokenBucket(api.TOKEN_RATE_LIMIT)
+    api._token_buckets.set('expired', expired_bucket)
+    asyncio.run(request())
+    assert token_buckets['refreshed'] is expired_bucket
@@ -0,0 +1,224 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from app.database.db import connect
+from app.database.schema import DailyPlay, PlayedTrack, Track, User, UserToken
+from app.spotify import tasks
+
+
+def make_token(user_id):
+    """Builds an unsaved token of an unsaved user."""
+    user = User(id=user_id, email=f'{user_id}@mail.com', hashed_password='', scopes='')
+    return UserToken(user=user, access_token=f'token-{user_id}')
+
+
+def make_item(track_id, played_at='2021-06-01T12:00:00.000Z'):
+    """Builds a spotify recently played item."""
+    artist = {'id': 'a1', 'name': 'artist', 'href': 'href', 'uri': 'uri'}
+    track = {
+        'id': track_id,
+        'name': 'track',
+        'href': 'href',
+        'uri': 'uri',
+        'popularity': 1,
+        'artists': [artist],
+    }
+    return {'played_at': played_at, 'track': track}
+
+
+@pytest.fixture
+def recently_played(monkeypatch):
+    """Makes every user play one track."""
+    async def get_recently_played(access_token, after_timestamp, on_unauthorized):
+        return [make_item(access_token)]
+
+    monkeypatch.setattr(tasks, 'get_recently_played', get_recently_played)
+
+
+def test_fetch_played_tracks_ends_with_none(recently_played):
+    """All users are put on the queue, then None."""
+    async def fetch():
+        queue = asyncio.Queue()
+        await tasks.fetch_played_tracks([make_token('u1'), make_token('u2')], queue, 0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    *users, end = asyncio.run(fetch())
+    assert end is None
+    assert sorted(token.user.id for token, _ in users) == ['u1', 'u2']
+    for token, plays in users:
+        assert token.last_poll_plays == len(plays) == 1
+        assert token.played_after == 1622548800000
+
+
+def test_fetch_played_tracks_cancel_with_full_queue(recently_played):
+    """Cancelling the fetch does not wait for room on a full queue."""
+    async def cancel():
+        queue = asyncio.Queue(maxsize=1)
+        tokens = [make_token(f'u{i}') for i in range(3)]
+        producer = asyncio.create_task(tasks.fetch_played_tracks(tokens, queue, 0))
+        while not queue.full():
+            await asyncio.sleep(0)
+        producer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(producer, timeout=1)
+
+    asyncio.run(cancel())
+
+
+def test_fetch_played_tracks_skips_invalid_items(monkeypatch):
+    """Users whose items can not be normalised are skipped, None is still put."""
+    async def get_recently_played(access_token, after_timestamp, on_unauthorized):
+        if access_token == 'token-u1':
+            return [{'played_at': None, 'track': {}}]
+        return [make_item(access_token)]
+
+    monkeypatch.setattr(tasks, 'get_recently_played', get_recently_played)
+
+    async def fetch():
+        queue = asyncio.Queue(maxsize=1)
+        tokens = [make_token(f'u{i}') for i in range(3)]
+        producer = asyncio.create_task(tasks.fetch_played_tracks(tokens, queue, 0))
+
+        async def consume():
+            batches = tasks.iter_played_tracks_batches(queue, 1)
+            return [token.user.id async for batch, _ in batches for token in batch]
+
+        users = await asyncio.wait_for(consume(), timeout=1)
+        await producer
+        return users, tokens[1]
+
+    users, skipped = asyncio.run(fetch())
+    assert sorted(users) == ['u0', 'u2']
+    assert skipped.played_after is None
+
+
+def test_get_played_tracks_skips_failed_batch(database, recently_played, monkeypatch):
+    """A failed batch is rolled back and the next users are still saved."""
+    save_played_tracks = tasks.save_played_tracks
+
+    async def failing_save_played_tracks(all_tracks):
+        if any(play.get('user_id') == 'u1' for play in all_tracks):
+            raise RuntimeError('save failed')
+        await save_played_tracks(all_tracks)
+
+    monkeypatch.setattr(tasks, 'save_played_tracks', failing_save_played_tracks)
+    monkeypatch.setattr(tasks, 'MAX_CONCURRENT_USERS', 1)
+    monkeypatch.setattr(tasks, 'PIPELINE_BATCH_SIZE', 1)
+    monkeypatch.setattr(tasks, 'PIPELINE_QUEUE_SIZE', 1)
+
+    async def run():
+        async with connect():
+            for user_id in ('u0', 'u1', 'u2'):
+                token = make_token(user_id)
+                await token.user.save()
+                await token.save()
+            await tasks.get_played_tracks()
+            plays = await PlayedTrack.objects.all()
+            tracks = await Track.objects.order_by('id').all()
+            tokens = await UserToken.objects.order_by('user').all()
+            return sorted(play.user.id for play in plays), tracks, tokens
+
+    played_users, tracks, tokens = asyncio.run(run())
+    assert played_users == ['u0', 'u2']
+    assert [track.id for track in tracks] == ['token-u0', 'token-u2']
+    assert [token.played_after is not None for token in tokens] == [True, False, True]
+
+
+def test_update_access_tokens_of_heavy_listeners(database, monkeypatch):
+    """Only the expiring tokens of heavy listeners are refreshed."""
+    async def get_access_token(refresh_token):
+        return {'access_token': 'refreshed', 'expires_in': 3600}
+
+    monkeypatch.setattr(tasks, 'get_access_token', get_access_token)
+
+    async def run():
+        async with connect():
+            for user_id, heavy_listener in (('u1', True), ('u2', False)):
+                token = make_token(user_id)
+                token.heavy_listener = heavy_listener
+                await token.user.save()
+                await token.save()
+            await tasks.update_access_tokens(heavy_listeners_only=True)
+            tokens = await UserToken.objects.order_by('user').all()
+            return [token.access_token for token in tokens]
+
+    assert asyncio.run(run()) == ['refreshed', 'token-u2']
+
+
+def test_update_heavy_listener_by_rate(monkeypatch):
+    """The play rate counts the hours since the previous poll."""
+    monkeypatch.setattr(tasks, 'HEAVY_LISTENER_RATE', 2)
+    hour = 3600000
+    token = make_token('u1')
+    tasks.update_heavy_listener(token, 40, 100 * hour)
+    assert not token.heavy_listener
+    tasks.update_heavy_listener(token, 3, 101 * hour)
+    assert token.heavy_listener
+    assert token.polled_at == 101 * hour
+    assert token.last_poll_plays == 3
+
+
+def test_update_heavy_listener_is_sticky(monkeypatch):
+    """Heavy listeners stop being one only after several low rate polls."""
+    monkeypatch.setattr(tasks, 'HEAVY_LISTENER_RATE', 2)
+    monkeypatch.setattr(tasks, 'HEAVY_LISTENER_LOW_POLLS', 3)
+    hour = 3600000
+    token = make_token('u1')
+    tasks.update_heavy_listener(token, 50, 0)
+    assert token.heavy_listener
+    for i in range(1, 3):
+        tasks.update_heavy_listener(token, 0, i * hour)
+    tasks.update_heavy_listener(token, 5, 3 * hour)
+    assert token.heavy_listener
+    assert token.low_rate_polls == 0
+    for i in range(4, 7):
+        tasks.update_heavy_listener(token, 0, i * hour)
+    assert not token.heavy_listener
+    assert token.low_rate_polls == 0
+
+
+def test_iter_days_ranges():
+    """Consecutive days are grouped into half-open ranges."""
+    days = [date(2021, 6, 3), date(2021, 6, 1), date(2021, 6, 2), date(2021, 6, 5)]
+    assert list(tasks.iter_days_ranges(days)) == [
+        (datetime(2021, 6, 1), datetime(2021, 6, 4)),
+        (datetime(2021, 6, 5), datetime(2021, 6, 6)),
+    ]
+    assert list(tasks.iter_days_ranges([])) == []
+
+
+def test_save_played_tracks_batch_updates_daily_plays(database):
+    """Plays of any day are counted on daily_plays when saved."""
+    def normalise(items):
+        return [tasks.normalise_played_track(item, 'u1') for item in items]
+
+    async def run():
+        async with connect():
+            token = make_token('u1')
+            await token.user.save()
+            await token.save()
+            first_plays = [
+                make_item('t1', '2020-01-01T10:00:00.000Z'),
+                make_item('t1', '2021-06-01T10:00:00.000Z'),
+            ]
+            await tasks.save_played_tracks_batch([token], normalise(first_plays))
+            await Track.objects.filter(id='t1').update(duration_ms=1000)
+            await tasks.update_daily_plays_durations(['t1'])
+            later_plays = [
+                make_item('t1', '2021-06-01T23:59:59.000Z'),
+                make_item('t2', '2021-06-02T00:00:00.000Z'),
+            ]
+            await tasks.save_played_tracks_batch([token], normalise(later_plays))
+            daily_plays = await DailyPlay.objects.order_by(['day', 'track']).all()
+            return [
+                (play.day, play.track.id, play.plays, play.duration_ms)
+                for play in daily_plays
+            ]
+
+    assert asyncio.run(run()) == [
+        (date(2020, 1, 1), 't1', 1, 1000),
+        (date(2021, 6, 1), 't1', 2, 2000),
+        (date(2021, 6, 2), 't2', 1, 0),
+    ]
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+import sqlalchemy
+from dateutil.tz import gettz
+
+from app.api.crud import played_tracks as crud
+from app.api.crud.played_tracks import get_played_tracks
+from app.api.routers.user import day_start_utc, get_timezone, played_tracks_query
+from app.database.db import connect
+from app.database.schema import PlayedTrack, Track, User
+
+
+@pytest.mark.parametrize('name', ['UTC', 'America/Sao_Paulo', 'Asia/Kolkata'])
+def test_get_timezone(name):
+    """IANA timezones are accepted."""
+    assert get_timezone(name) is not None
+
+
+@pytest.mark.parametrize(
+    'name', ['', '/etc/passwd', '/nonexistent', '../../etc/passwd', 'UTC+3', 'Mars/Base']
+)
+def test_get_timezone_rejects_other_names(name):
+    """Empty names, file paths and unknown names are rejected."""
+    assert get_timezone(name) is None
+
+
+def test_day_start_utc():
+    """Days start at the local midnight, daylight saving time included."""
+    sao_paulo, new_york = gettz('America/Sao_Paulo'), gettz('America/New_York')
+    assert day_start_utc(date(2021, 6, 1), sao_paulo) == datetime(2021, 6, 1, 3)
+    assert day_start_utc(date(2021, 3, 14), new_york) == datetime(2021, 3, 14, 5)
+    assert day_start_utc(date(2021, 3, 15), new_york) == datetime(2021, 3, 15, 4)
+    assert day_start_utc(date(2021, 6, 1), gettz('UTC')) == datetime(2021, 6, 1)
+
+
+def test_played_tracks_query():
+    """The bounds extend the user filter as a half-open interval."""
+    tz = gettz('America/Sao_Paulo')
+    assert played_tracks_query('u1', date(2021, 6, 1), date(2021, 6, 2), tz) == {
+        'user': 'u1',
+        'played_at__gte': datetime(2021, 6, 1, 3),
+        'played_at__lt': datetime(2021, 6, 2, 3),
+    }
+    assert played_tracks_query('u1', None, date(2021, 6, 2), tz) == {
+        'user': 'u1',
+        'played_at__lt': datetime(2021, 6, 2, 3),
+    }
+    assert played_tracks_query('u1', None, None, tz) == {'user': 'u1'}
+
+
+def test_played_tracks_query_filters_plays(database):
+    """Only the user plays from the start of the first day are returned."""
+    plays = [
+        ('u1', datetime(2021, 6, 1, 2, 59)),
+        ('u1', datetime(2021, 6, 1, 3)),
+        ('u1', datetime(2021, 6, 2, 2, 59)),
+        ('u1', datetime(2021, 6, 2, 3)),
+        ('u2', datetime(2021, 6, 1, 12)),
+    ]
+
+    async def run():
+        async with connect():
+            for user_id in ('u1', 'u2'):
+                await User.objects.create(
+                    id=user_id, email=f'{user_id}@mail.com', hashed_password='', scopes=''
+                )
+            await Track.objects.create(id='t1', name='', href='', uri='', popularity=0)
+            for user_id, played_at in plays:
+                await PlayedTrack.objects.create(
+                    user=user_id, track='t1', played_at=played_at
+                )
+            query = played_tracks_query(
+                'u1', date(2021, 6, 1), date(2021, 6, 2), gettz('America/Sao_Paulo')
+            )
+            return await get_played_tracks(query)
+
+    played_tracks = asyncio.run(run())
+    assert [played_track['played_at'] for played_track in played_tracks] == [
+        datetime(2021, 6, 1, 3), datetime(2021, 6, 2, 2, 59)
+    ]
+
+
+def test_played_tracks_query_uses_index(database):
+    """A page of a day range is read from the user and played at index."""
+    engine = sqlalchemy.create_engine(
+        str(database.url.replace(dialect='postgresql', driver=''))
+    )
+    seed = [
+        """
+        INSERT INTO users (id, email, hashed_password, scopes)
+        SELECT 'u' || i, 'u' || i, '', '' FROM generate_series(1, 50) i
+        """,
+        """
+        INSERT INTO tracks (id, name, href, uri, popularity)
+        SELECT 't' || i, '', '', '', 0 FROM generate_series(1, 1000) i
+        """,
+        """
+        INSERT INTO playedtracks ("user", track, played_at)
+        SELECT 'u' || (i % 50 + 1), 't' || (i % 1000 + 1),
+            timestamp '2021-01-01' + i * interval '1 minute'
+        FROM generate_series(1, 100000) i
+        """,
+        'ANALYZE',
+    ]
+    query = crud.played_tracks_query(
+        played_tracks_query('u1', date(2021, 2, 1), date(2021, 2, 8), gettz('UTC')),
+        limit=50,
+    )
+    compiled = query.compile(engine)
+    try:
+        with engine.begin() as connection:
+            for statement in seed:
+                connection.execute(sqlalchemy.text(statement))
+            plan = connection.exec_driver_sql(
+                f'EXPLAIN {compiled}', compiled.params
+            ).scalars().all()
+    finally:
+        engine.dispose()
+    assert 'ix_playedtracks_user_played_at' in '\n'.join(plan)
+    assert not any('Seq Scan on playedtracks' in line for line in plan)